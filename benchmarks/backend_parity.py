@@ -0,0 +1,130 @@
+"""
+Checks that the int8 backend stays within tolerance of fp32, for QG and QA separately.
+
+Both backends run on the same passages with greedy QG decoding, so differences come only
+from the backend. The script reports:
+- QG agreement: share of generated questions identical to the fp32 ones,
+- QA agreement: mean token F1 between int8 and fp32 answers to the fp32 questions,
+- latency and serialized weight size for each backend,
+and exits non-zero if either agreement falls below its threshold.
+
+Usage:
+    python benchmarks/backend_parity.py [--min-qg-agreement 0.6] [--min-qa-f1 0.8]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llm_model import QAGenerator
+
+
+PASSAGES = [
+    "Photosynthesis is the process used by plants, algae and cyanobacteria to convert light energy into "
+    "chemical energy. It takes place in the chloroplasts, which contain the green pigment chlorophyll.",
+    "The mitochondrion is the powerhouse of the cell. It produces adenosine triphosphate through cellular "
+    "respiration, using oxygen and glucose and releasing carbon dioxide and water.",
+    "The French Revolution began in 1789 with the storming of the Bastille. It abolished the monarchy and "
+    "led to the rise of Napoleon Bonaparte, who crowned himself emperor in 1804.",
+    "Newton's second law states that the force acting on an object equals its mass times its acceleration. "
+    "It is usually written as F = ma, with force measured in newtons.",
+    "Inflation is the rate at which the general level of prices rises. Central banks try to keep it low and "
+    "stable, commonly targeting an annual rate of about two percent.",
+    "Plate tectonics describes the large-scale motion of the plates that make up the Earth's lithosphere. "
+    "Earthquakes and volcanoes occur mostly along the boundaries between plates.",
+]
+
+
+def token_f1(prediction, reference):
+    """Token-level F1 between two answers, as in SQuAD evaluation."""
+    pred, ref = prediction.lower().split(), reference.lower().split()
+    if not pred or not ref:
+        return float(pred == ref)
+    common = sum(min(pred.count(token), ref.count(token)) for token in set(pred))
+    if common == 0:
+        return 0.0
+    precision, recall = common / len(pred), common / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def weight_megabytes(model):
+    """Serialized size of a model's weights, which also counts packed quantized weights."""
+    import torch
+
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def run_backend(backend, args):
+    """
+    Loads both models on the given backend and generates one question per passage.
+
+    Returns:
+        dict: The generator, its questions, the QG time and the weight size of each model.
+    """
+    qa_generator = QAGenerator(qg_model_name=args.qg_model, qa_model_name=args.qa_model,
+                               qg_backend=backend, qa_backend=backend, num_threads=args.num_threads)
+    qa_generator.warm_up()
+
+    start = time.perf_counter()
+    questions = [qs[0] if qs else "" for qs in
+                 qa_generator._generate_questions(PASSAGES, [1] * len(PASSAGES), 512, decoding="greedy")]
+    qg_seconds = time.perf_counter() - start
+
+    return {
+        "generator": qa_generator,
+        "questions": questions,
+        "qg_seconds": qg_seconds,
+        "qg_megabytes": weight_megabytes(qa_generator.qg_model),
+        "qa_megabytes": weight_megabytes(qa_generator.qa_pipeline.model),
+    }
+
+
+def answer(run, questions):
+    """Answers each question against its passage, returning the answers and the time taken."""
+    qa_inputs = [{"question": q, "context": passage} for q, passage in zip(questions, PASSAGES)]
+    start = time.perf_counter()
+    results = run["generator"]._run_qa(qa_inputs, max_qa_answer_length=50)
+    return [r["answer"] if r else "" for r in results], time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the int8 backend against fp32.")
+    parser.add_argument("--qg-model", default="valhalla/t5-base-qg-hl")
+    parser.add_argument("--qa-model", default="distilbert-base-uncased-distilled-squad")
+    parser.add_argument("--num-threads", type=int, default=None)
+    parser.add_argument("--min-qg-agreement", type=float, default=0.6,
+                        help="Minimum share of int8 questions identical to fp32.")
+    parser.add_argument("--min-qa-f1", type=float, default=0.8,
+                        help="Minimum mean token F1 of int8 answers against fp32 answers.")
+    args = parser.parse_args()
+
+    reference = run_backend("fp32", args)
+    candidate = run_backend("int8", args)
+
+    # Answer the same (fp32) questions with both backends, so QA is compared in isolation
+    reference_answers, reference_qa_seconds = answer(reference, reference["questions"])
+    candidate_answers, candidate_qa_seconds = answer(candidate, reference["questions"])
+
+    qg_agreement = sum(a == b for a, b in zip(reference["questions"], candidate["questions"])) / len(PASSAGES)
+    qa_f1 = sum(token_f1(a, b) for a, b in zip(candidate_answers, reference_answers)) / len(PASSAGES)
+
+    print(f"{'backend':<8} {'QG time':>9} {'QA time':>9} {'QG weights':>11} {'QA weights':>11}")
+    for name, run, qa_seconds in (("fp32", reference, reference_qa_seconds), ("int8", candidate, candidate_qa_seconds)):
+        print(f"{name:<8} {run['qg_seconds']:8.2f}s {qa_seconds:8.2f}s "
+              f"{run['qg_megabytes']:9.0f}MB {run['qa_megabytes']:9.0f}MB")
+    print(f"\nQG agreement: {qg_agreement:.2f} (min {args.min_qg_agreement})")
+    print(f"QA answer F1: {qa_f1:.2f} (min {args.min_qa_f1})")
+
+    if qg_agreement < args.min_qg_agreement or qa_f1 < args.min_qa_f1:
+        print("FAIL: int8 backend is outside tolerance.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
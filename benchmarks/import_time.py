@@ -0,0 +1,84 @@
+"""
+Measures the import time of the app's own top-level modules and checks it against a budget.
+
+Each module is imported in a fresh interpreter with `-X importtime`, so results do not depend
+on what an earlier import already loaded. The heavy inference stack (torch, transformers) must
+not be imported at all: models are loaded lazily by QAGenerator.
+
+Usage:
+    python benchmarks/import_time.py [--budget-ms 500]
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules imported at the top of streamlit_app.py, other than streamlit itself.
+# inference_server is only imported when FLASHCARD_SERVER_URL is set.
+APP_MODULES = ["utils", "cache", "llm_model", "instrumentation", "exporters", "card_rendering"]
+
+# Packages that must stay off the import path until they are actually needed:
+# the inference stack until a model runs, pyarrow and genanki until a deck is exported in their format
+LAZY_PACKAGES = ["torch", "transformers", "pyarrow", "genanki"]
+
+
+def measure_import(module):
+    """
+    Imports a module in a fresh interpreter.
+
+    Args:
+        module (str): The module name.
+
+    Returns:
+        tuple: (cumulative import time in milliseconds, set of top-level packages imported).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total_us, imported = 0, set()
+    for line in result.stderr.splitlines():
+        # Lines look like: "import time:   self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.rstrip()
+        imported.add(name.strip().split(".")[0])
+        if name.strip() == module:
+            total_us = int(cumulative)
+    return total_us / 1000, imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=500.0,
+                        help="Maximum combined import time of the app modules, in milliseconds.")
+    args = parser.parse_args()
+
+    total_ms, failures = 0.0, []
+    for module in APP_MODULES:
+        elapsed_ms, imported = measure_import(module)
+        total_ms += elapsed_ms
+        print(f"{module:<16} {elapsed_ms:8.1f} ms")
+        for package in LAZY_PACKAGES:
+            if package in imported:
+                failures.append(f"'{module}' imports '{package}' at module level")
+
+    print(f"{'total':<16} {total_ms:8.1f} ms (budget {args.budget_ms:.0f} ms)")
+    if total_ms > args.budget_ms:
+        failures.append(f"import time {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,79 @@
+"""
+Measures how bulk deck generation scales with ParallelQAGenerator's worker count.
+
+Generates decks for a fixed corpus of synthetic documents with 1, 2, 4, ... workers, each
+with the same number of torch threads, and reports documents/sec, speedup over one worker
+and parallel efficiency. Each configuration first runs one warm-up document per worker, so
+the timings exclude process start-up and model loading.
+
+By default the models are the tiny stand-ins from benchmarks/pipeline.py, which run offline
+on CPU; pass --qg-model/--qa-model to measure real models. Keep workers times threads at or
+below the number of physical cores.
+
+Usage:
+    python benchmarks/parallel_scaling.py --workers 1 2 4 8 --threads-per-worker 4
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel import ParallelQAGenerator
+from pipeline import build_tiny_models, make_synthetic_document
+from utils import preprocess_text
+
+
+def measure(texts, num_workers, threads_per_worker, num_qa, docs_per_task, generator_kwargs):
+    """
+    Generates decks for `texts` with `num_workers` workers.
+
+    Returns:
+        tuple: (seconds, total number of cards).
+    """
+    with ParallelQAGenerator(num_workers=num_workers, threads_per_worker=threads_per_worker,
+                             **generator_kwargs) as generator:
+        generator.generate_batch(texts[:num_workers], num_qa=num_qa)
+        start = time.perf_counter()
+        decks = generator.generate_batch(texts, num_qa=num_qa, docs_per_task=docs_per_task)
+        return time.perf_counter() - start, sum(len(deck) for deck in decks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure parallel deck generation scaling.")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--threads-per-worker", type=int, default=4)
+    parser.add_argument("--documents", type=int, default=32, help="Number of synthetic documents.")
+    parser.add_argument("--words", type=int, default=2000, help="Approximate words per document.")
+    parser.add_argument("--num-qa", type=int, default=10)
+    parser.add_argument("--docs-per-task", type=int, default=1)
+    parser.add_argument("--qg-model", default=None)
+    parser.add_argument("--qa-model", default=None)
+    args = parser.parse_args()
+
+    texts = [preprocess_text(make_synthetic_document(args.words, seed)) for seed in range(args.documents)]
+    print(f"{args.documents} documents of ~{args.words} words, {args.threads_per_worker} threads per worker, "
+          f"{os.cpu_count()} cores")
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        if args.qg_model and args.qa_model:
+            qg_model, qa_model = args.qg_model, args.qa_model
+        else:
+            qg_model, qa_model = build_tiny_models(model_dir, "\n".join(texts))
+        generator_kwargs = dict(qg_model_name=qg_model, qa_model_name=qa_model)
+
+        baseline = None
+        for num_workers in args.workers:
+            seconds, cards = measure(texts, num_workers, args.threads_per_worker, args.num_qa,
+                                     args.docs_per_task, generator_kwargs)
+            docs_per_sec = args.documents / seconds
+            baseline = baseline or docs_per_sec / num_workers
+            speedup = docs_per_sec / baseline
+            print(f"{num_workers:3d} workers: {seconds:8.2f} s {docs_per_sec:8.2f} docs/s {cards:6d} cards "
+                  f"speedup {speedup:5.2f}x efficiency {speedup / num_workers:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
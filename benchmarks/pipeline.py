@@ -0,0 +1,305 @@
+"""
+Benchmarks the flashcard pipeline stage by stage:
+extraction -> preprocessing -> chunking -> question generation -> dedup -> question answering.
+
+Runs over a fixed corpus of synthetic documents (and optionally real files) at several
+`num_qa` values, and reports per-stage wall time, QG rounds and tokens/sec, cards/sec and
+peak RSS. Generation goes through `QAGenerator.generate_qa_pairs` with a RunStats, so every
+round of the question budget is counted. Each configuration runs in a fresh interpreter,
+so its peak RSS is its own. Results are written as JSON so runs from different commits can
+be compared with --compare.
+
+By default the models are tiny, randomly initialized stand-ins built locally (tokenizers
+are trained on the synthetic corpus), so the benchmark runs offline on CPU. Their output
+is meaningless, but the amount of work each stage does follows the real pipeline. Pass
+--qg-model/--qa-model to benchmark real models instead.
+
+Usage:
+    python benchmarks/pipeline.py --output bench.json
+    python benchmarks/pipeline.py --output new.json --compare bench.json
+    python benchmarks/pipeline.py --documents "course/*.pdf" --num-qa 10 25
+"""
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from instrumentation import RunStats
+from llm_model import QAGenerator
+from utils import extract_text_from_pdf, read_text_file, preprocess_text
+
+
+STAGES = ("extract", "preprocess", "chunk", "qg", "dedup", "qa")
+
+# The RunStats stages that make up each benchmark stage after preprocessing
+_RUN_STAGES = {
+    "chunk": ("chunking",),
+    "qg": ("chunk_cache_lookup", "qg_tokenize", "qg_generate", "qg_decode"),
+    # Near-duplicate filtering is timed inside "dedup"
+    "dedup": ("dedup",),
+    "qa": ("retrieval_index", "retrieval", "qa", "difficulty"),
+}
+
+# Synthetic document sizes, in words: a short note, a chapter and a textbook-sized input
+SYNTHETIC_SIZES = {"small": 400, "medium": 5000, "large": 40000}
+
+_TOPICS = ["photosynthesis", "the cell membrane", "mitochondria", "enzymes", "osmosis", "the nervous system",
+           "plate tectonics", "the water cycle", "supply and demand", "inflation", "the French Revolution",
+           "Newton's second law", "entropy", "covalent bonds", "the Krebs cycle", "binary search"]
+_VERBS = ["regulates", "converts", "transports", "depends on", "produces", "controls", "describes", "explains"]
+_OBJECTS = ["chemical energy", "the flow of ions", "market prices", "heat transfer", "genetic information",
+            "the rate of reaction", "political power", "sorted arrays", "atmospheric pressure", "glucose"]
+
+
+def make_synthetic_document(num_words, seed):
+    """
+    Builds a deterministic, textbook-like document of roughly `num_words` words.
+
+    Args:
+        num_words (int): Approximate length of the document.
+        seed (int): Random seed, so the corpus is identical between runs.
+
+    Returns:
+        str: The raw document text, with paragraph breaks and irregular whitespace like extracted text.
+    """
+    rng = random.Random(seed)
+    paragraphs, words = [], 0
+    while words < num_words:
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            sentence = (f"{rng.choice(_TOPICS).capitalize()} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} "
+                        f"because {rng.choice(_TOPICS)} {rng.choice(_VERBS)}  {rng.choice(_OBJECTS)}.")
+            sentences.append(sentence)
+            words += len(sentence.split())
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def build_corpus(document_globs):
+    """
+    Returns the benchmark corpus as (name, kind, raw bytes) tuples.
+
+    Args:
+        document_globs (list): Optional glob patterns of real .pdf/.txt documents to include.
+    """
+    corpus = [(f"synthetic-{name}", "txt", make_synthetic_document(size, seed=i).encode("utf-8"))
+              for i, (name, size) in enumerate(SYNTHETIC_SIZES.items())]
+    for pattern in document_globs or []:
+        for path in sorted(glob.glob(pattern, recursive=True)):
+            kind = "pdf" if path.lower().endswith(".pdf") else "txt"
+            with open(path, "rb") as f:
+                corpus.append((os.path.basename(path), kind, f.read()))
+    return corpus
+
+
+def build_tiny_models(out_dir, training_text):
+    """
+    Saves tiny, randomly initialized T5 and DistilBERT QA models with locally trained tokenizers.
+
+    Args:
+        out_dir (str): Directory to save the models in.
+        training_text (str): Text to train the tokenizers on.
+
+    Returns:
+        tuple: (QG model path, QA model path).
+    """
+    import sentencepiece as spm
+    from transformers import (DistilBertConfig, DistilBertForQuestionAnswering, DistilBertTokenizerFast,
+                              T5Config, T5ForConditionalGeneration, T5Tokenizer)
+
+    qg_path, qa_path = os.path.join(out_dir, "tiny-t5-qg"), os.path.join(out_dir, "tiny-distilbert-qa")
+    lines = [line for line in training_text.splitlines() if line.strip()] + ["generate question: what is it?"]
+
+    spm_model = io.BytesIO()
+    spm.SentencePieceTrainer.train(sentence_iterator=iter(lines), model_writer=spm_model, vocab_size=256,
+                                   pad_id=0, eos_id=1, unk_id=2, bos_id=-1, hard_vocab_limit=False)
+    spm_path = os.path.join(out_dir, "spiece.model")
+    with open(spm_path, "wb") as f:
+        f.write(spm_model.getvalue())
+    qg_tokenizer = T5Tokenizer(vocab_file=spm_path, extra_ids=0)
+    qg_config = T5Config(vocab_size=len(qg_tokenizer), d_model=64, d_ff=128, d_kv=16, num_layers=2, num_heads=4,
+                         decoder_start_token_id=qg_tokenizer.pad_token_id)
+    qg_tokenizer.save_pretrained(qg_path)
+    T5ForConditionalGeneration(qg_config).save_pretrained(qg_path)
+
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", "?", ".", ","]
+    vocab += sorted({word.strip(".,?").lower() for line in lines for word in line.split()} - set(vocab))
+    vocab_path = os.path.join(out_dir, "vocab.txt")
+    with open(vocab_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(vocab))
+    qa_tokenizer = DistilBertTokenizerFast(vocab_file=vocab_path)
+    qa_config = DistilBertConfig(vocab_size=len(vocab), dim=64, hidden_dim=128, n_layers=2, n_heads=4)
+    qa_tokenizer.save_pretrained(qa_path)
+    DistilBertForQuestionAnswering(qa_config).save_pretrained(qa_path)
+
+    return qg_path, qa_path
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in megabytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_pipeline(qa_generator, kind, raw, num_qa, decoding):
+    """
+    Runs the pipeline on one document, timing each stage.
+
+    Args:
+        qa_generator (QAGenerator): The generator to benchmark.
+        kind (str): 'pdf' or 'txt'.
+        raw (bytes): The raw document.
+        num_qa (int): The desired number of Q&A pairs.
+        decoding (str): The QG decoding mode.
+
+    Returns:
+        dict: Per-stage timings in seconds and counters for the run.
+    """
+    timings = {}
+    extract = extract_text_from_pdf if kind == "pdf" else read_text_file
+    start = time.perf_counter()
+    text = extract(io.BytesIO(raw))
+    timings["extract"] = time.perf_counter() - start
+    start = time.perf_counter()
+    text = preprocess_text(text)
+    timings["preprocess"] = time.perf_counter() - start
+
+    stats = RunStats()
+    qa_pairs = qa_generator.generate_qa_pairs(text, num_qa=num_qa, decoding=decoding, stats=stats)
+    for stage, run_stages in _RUN_STAGES.items():
+        timings[stage] = sum(stats.timings.get(name, 0.0) for name in run_stages)
+
+    counters = stats.counters
+    total = timings["extract"] + timings["preprocess"] + stats.timings.get("total", 0.0)
+    return {
+        "stages": timings,
+        "total_s": total,
+        "chars": len(text),
+        "chunks": counters.get("chunks", 0),
+        "qg_rounds": counters.get("qg_rounds", 0),
+        "candidate_questions": counters.get("qg_sequences", 0),
+        "unique_questions": counters.get("questions_selected", 0),
+        "cards": len(qa_pairs),
+        "qg_tokens_per_s": counters.get("qg_input_tokens", 0) / timings["qg"] if timings["qg"] else 0.0,
+        "cards_per_s": len(qa_pairs) / total if total else 0.0,
+    }
+
+
+def run_configuration(args, document, num_qa):
+    """
+    Benchmarks one document at one `num_qa` in this process, which runs nothing else.
+
+    Returns:
+        dict: The fastest of `args.repeat` runs, with this process's peak RSS.
+    """
+    kind, raw = next((kind, raw) for name, kind, raw in build_corpus(args.documents) if name == document)
+    qa_generator = QAGenerator(qg_model_name=args.qg_model, qa_model_name=args.qa_model)
+    qa_generator.warm_up()
+    loaded_rss = peak_rss_mb()
+
+    result = min((run_pipeline(qa_generator, kind, raw, num_qa, args.decoding) for _ in range(args.repeat)),
+                 key=lambda r: r["total_s"])
+    result.update({"peak_rss_mb": peak_rss_mb(), "rss_growth_mb": peak_rss_mb() - loaded_rss})
+    return result
+
+
+def measure(args, document, num_qa):
+    """Runs `run_configuration` in a fresh interpreter and returns its result."""
+    command = [sys.executable, os.path.abspath(__file__), "--child", document, str(num_qa),
+               "--decoding", args.decoding, "--repeat", str(args.repeat),
+               "--qg-model", args.qg_model, "--qa-model", args.qa_model]
+    if args.documents:
+        command += ["--documents", *args.documents]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Prints the change in total time per run against an earlier results file."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["document"], r["num_qa"], r["decoding"]): r for r in json.load(f)["runs"]}
+
+    print(f"\nCompared with {baseline_path}:")
+    for run in results["runs"]:
+        old = baseline.get((run["document"], run["num_qa"], run["decoding"]))
+        if old and old["total_s"]:
+            change = (run["total_s"] - old["total_s"]) / old["total_s"] * 100
+            print(f"  {run['document']:<24} num_qa={run['num_qa']:<3} {old['total_s']:8.3f}s -> "
+                  f"{run['total_s']:8.3f}s ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the flashcard generation pipeline.")
+    parser.add_argument("--num-qa", type=int, nargs="+", default=[5, 10, 25])
+    parser.add_argument("--decoding", default="beam")
+    parser.add_argument("--documents", nargs="*", help="Glob patterns of real .pdf/.txt documents to include.")
+    parser.add_argument("--qg-model", help="QG model ID or path. Defaults to a tiny local stand-in.")
+    parser.add_argument("--qa-model", help="QA model ID or path. Defaults to a tiny local stand-in.")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per configuration; the fastest is kept.")
+    parser.add_argument("--output", default="bench_results.json", help="Where to write the JSON results.")
+    parser.add_argument("--compare", help="An earlier results file to compare against.")
+    parser.add_argument("--child", nargs=2, metavar=("DOCUMENT", "NUM_QA"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_configuration(args, args.child[0], int(args.child[1]))))
+        return
+
+    corpus = build_corpus(args.documents)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        requested_models = (args.qg_model, args.qa_model)
+        if not args.qg_model or not args.qa_model:
+            tiny_qg, tiny_qa = build_tiny_models(model_dir, corpus[0][2].decode("utf-8"))
+            args.qg_model, args.qa_model = args.qg_model or tiny_qg, args.qa_model or tiny_qa
+
+        runs = []
+        for name, _, _ in corpus:
+            for num_qa in args.num_qa:
+                result = measure(args, name, num_qa)
+                result.update({"document": name, "num_qa": num_qa, "decoding": args.decoding})
+                runs.append(result)
+
+                stages = " ".join(f"{stage}={result['stages'][stage] * 1000:.0f}ms" for stage in STAGES)
+                print(f"{name:<24} num_qa={num_qa:<3} {stages} | {result['qg_rounds']} rounds "
+                      f"{result['qg_tokens_per_s']:.0f} tok/s {result['cards_per_s']:.2f} cards/s "
+                      f"peak {result['peak_rss_mb']:.0f} MB (+{result['rss_growth_mb']:.0f} MB)")
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "qg_model": requested_models[0] or "tiny-stand-in",
+        "qa_model": requested_models[1] or "tiny-stand-in",
+        "runs": runs,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {len(runs)} runs to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
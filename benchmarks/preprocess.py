@@ -0,0 +1,93 @@
+"""
+Microbenchmark of text preprocessing: the single-pass TextPreprocessor against the previous
+regex-chain implementation of `utils.preprocess_text`.
+
+The input is synthetic PDF-like text: lines wrapped at 80 characters with indentation and
+trailing spaces, words hyphenated across line breaks, blank lines, and a running header
+and page-number footer on every page. Reports the best time per run for whole-document
+and page-by-page preprocessing, and how many characters each leaves.
+
+Usage:
+    python benchmarks/preprocess.py [--pages 500] [--repeat 5]
+"""
+import argparse
+import os
+import re
+import sys
+import textwrap
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import make_synthetic_document
+from preprocessing import TextPreprocessor
+from utils import preprocess_text
+
+
+def legacy_preprocess_text(text):
+    """`utils.preprocess_text` before the single-pass rewrite, kept as the baseline."""
+    if text is None:
+        return ""
+    text = re.sub(r'\n+', '\n', text)
+    text = re.sub(r' +', ' ', text)
+    text = "\n".join([line.strip() for line in text.splitlines()])
+    return text.strip()
+
+
+def make_pages(num_pages, words_per_page=450):
+    """Builds PDF-like pages with wrapped, indented lines, hyphenation, headers and page numbers."""
+    pages = []
+    for page_num in range(1, num_pages + 1):
+        body = make_synthetic_document(words_per_page, seed=page_num)
+        lines = []
+        for paragraph in body.split("\n\n"):
+            wrapped = textwrap.wrap(paragraph, 80)
+            for i in range(len(wrapped) - 1):
+                line = wrapped[i]
+                # Hyphenate the next line's first word across every third line break, as typesetting does
+                head, _, rest = wrapped[i + 1].partition(" ")
+                if i % 3 == 0 and len(head) > 4:
+                    line, wrapped[i + 1] = f"{line} {head[:2]}-", f"{head[2:]} {rest}"
+                lines.append(f"   {line}  ")
+            lines += [f"   {wrapped[-1]}", "", ""]
+        pages.append(f"Introduction to Biology - Chapter {page_num // 20 + 1}\n\n" + "\n".join(lines)
+                     + f"\n\n   {page_num}   \n")
+    return pages
+
+
+def best_time(func, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark text preprocessing.")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = make_pages(args.pages)
+    document = "\f".join(pages)
+    print(f"{args.pages} pages, {len(document) / (1024 * 1024):.1f} MB")
+
+    preprocessor = TextPreprocessor()
+    runs = [
+        ("legacy, whole document", lambda: legacy_preprocess_text(document)),
+        ("preprocess_text, whole document", lambda: preprocess_text(document)),
+        ("legacy, page by page", lambda: "\n".join(legacy_preprocess_text(page) for page in pages)),
+        ("TextPreprocessor.iter_pages", lambda: "\n".join(preprocessor.iter_pages(pages))),
+        ("TextPreprocessor.clean, no header removal", lambda: "\n".join(preprocessor.clean(page) for page in pages)),
+    ]
+    baseline = None
+    for name, func in runs:
+        seconds, text = best_time(func, args.repeat)
+        baseline = baseline or seconds
+        print(f"{name:<44} {seconds * 1000:8.1f} ms ({baseline / seconds:4.1f}x) {len(text):>10,d} chars")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Checks that the streaming text pipeline keeps peak memory independent of document size.
+
+Writes a large synthetic text document, then runs extraction -> preprocessing -> chunking
+over it in a fresh interpreter, once reading the whole document (`read_text_file`,
+`preprocess_text`, `chunk_text`) and once streaming it (`iter_text_blocks`,
+`iter_preprocessed`, `iter_sentences`, `iter_chunks`). Chunks are spooled to a temporary
+file, as `QAGenerator.iter_qa_pairs_from_pages` does. Tokens are counted as words, so no
+model is needed; with the real models, their memory is constant per round on top of this.
+
+Exits non-zero if the streaming run grows RSS by more than the ceiling.
+
+Usage:
+    python benchmarks/streaming_memory.py [--size-mb 100] [--max-rss-growth-mb 64]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import make_synthetic_document, peak_rss_mb
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def run_child(mode, path):
+    """Runs one pipeline mode over `path` and prints its chunk count and RSS growth as JSON."""
+    from utils import (chunk_text, iter_chunks, iter_preprocessed, iter_sentences, iter_text_blocks,
+                       preprocess_text, read_text_file)
+
+    baseline = peak_rss_mb()
+    num_chunks = 0
+    with open(path, "rb") as f, tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+        if mode == "stream":
+            sentences = iter_sentences(iter_preprocessed(iter_text_blocks(f)))
+            chunks = iter_chunks(sentences, count_words, max_tokens=400, overlap_sentences=1)
+        else:
+            chunks = chunk_text(preprocess_text(read_text_file(f)), count_words, max_tokens=400, overlap_sentences=1)
+        for chunk in chunks:
+            spool.write(json.dumps(chunk) + "\n")
+            num_chunks += 1
+    print(json.dumps({"chunks": num_chunks, "rss_growth_mb": peak_rss_mb() - baseline}))
+
+
+def measure(mode, path):
+    result = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", mode, path],
+                            capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check peak memory of the streaming text pipeline.")
+    parser.add_argument("--size-mb", type=int, default=100, help="Size of the synthetic document.")
+    parser.add_argument("--max-rss-growth-mb", type=float, default=64.0,
+                        help="Maximum RSS growth allowed for the streaming pipeline.")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return 0
+
+    block = make_synthetic_document(20000, seed=0) + "\n\n"
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", encoding="utf-8", delete=False) as f:
+        path = f.name
+        for _ in range(max(1, args.size_mb * 1024 * 1024 // len(block))):
+            f.write(block)
+    try:
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        full, stream = measure("full", path), measure("stream", path)
+    finally:
+        os.remove(path)
+
+    print(f"Document: {size_mb:.0f} MB")
+    print(f"full   {full['chunks']:8d} chunks, RSS +{full['rss_growth_mb']:.0f} MB")
+    print(f"stream {stream['chunks']:8d} chunks, RSS +{stream['rss_growth_mb']:.0f} MB "
+          f"(max {args.max_rss_growth_mb:.0f} MB)")
+
+    if stream["rss_growth_mb"] > args.max_rss_growth_mb:
+        print("FAIL: streaming pipeline memory grows with document size.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""
+Plans question generation in rounds, so that model work follows the number of cards asked for.
+
+Only some generated questions become cards: some repeat earlier questions and some get no
+valid answer. A fixed, worst-case number of beams per chunk mostly produces candidates that
+are thrown away. QuestionBudget instead starts with a lean round of about one candidate per
+card, measures the yield of good cards per candidate, and plans each following round for the
+cards still missing, asking for more candidates per card only as far as the yield calls for. It moves to
+chunks that have not been used yet, spread over the document, and only asks used chunks for
+more candidates once every chunk has been used.
+"""
+import math
+
+
+# Most candidates ever requested from one chunk, however low the yield, unless the chunk's
+# quota is large: a chunk asked for q questions may always be asked for 2q candidates
+MAX_CANDIDATES_PER_CHUNK = 16
+
+# Weight of the initial yield guess, in candidates, against the observed yield; small, so a
+# measured low yield soon outweighs the optimistic first guess
+_PRIOR_CANDIDATES = 4
+
+
+def spread(items, count):
+    """Picks `count` items evenly spaced over `items`, keeping their order."""
+    if count >= len(items):
+        return list(items)
+    return [items[int((i + 0.5) * len(items) / count)] for i in range(count)]
+
+
+class YieldEstimate:
+    def __init__(self, initial_yield=1.0, min_yield=0.1):
+        """
+        Tracks the share of generated candidate questions that become cards.
+
+        Args:
+            initial_yield (float): The yield assumed before anything has been generated. 1.0 asks
+                                   for one candidate per card until the yield is measured.
+            min_yield (float): Lower bound of the estimate, which caps how far one bad round widens the next.
+        """
+        self.initial_yield = initial_yield
+        self.min_yield = min_yield
+        self.candidates = 0
+        self.kept = 0
+
+
+    @property
+    def value(self):
+        # Blended with the initial guess, so a single small round does not swing the estimate
+        observed = (self.kept + self.initial_yield * _PRIOR_CANDIDATES) / (self.candidates + _PRIOR_CANDIDATES)
+        return max(self.min_yield, observed)
+
+
+    def record(self, num_candidates, num_kept):
+        """Adds one round's number of generated candidates and of cards kept from them."""
+        self.candidates += num_candidates
+        self.kept += num_kept
+
+
+    def candidates_for(self, num_questions):
+        """Returns how many candidates to generate to expect `num_questions` cards from them."""
+        return max(1, math.ceil(num_questions / self.value))
+
+
+class QuestionBudget:
+    def __init__(self, num_chunks, max_rounds=4, max_candidates=MAX_CANDIDATES_PER_CHUNK, initial_yield=1.0):
+        """
+        Decides, round by round, which chunks of one document to generate questions from and how many.
+
+        Args:
+            num_chunks (int): The number of chunks the document was split into.
+            max_rounds (int): Most rounds of question generation to run.
+            max_candidates (int): Most candidates to request from one chunk, over all rounds, raised to
+                                  twice the chunk's largest quota. 1 for decoding modes that return
+                                  a single sequence, which is never raised.
+            initial_yield (float): The share of candidates assumed to become cards in the first round.
+        """
+        self.max_rounds = max_rounds
+        self.max_candidates = max_candidates
+        self.yield_estimate = YieldEstimate(initial_yield)
+        # Candidates requested from each chunk so far; 0 for chunks not used yet
+        self.widths = [0] * num_chunks
+        self.caps = [max_candidates] * num_chunks
+        self.rounds = 0
+
+
+    def plan(self, need):
+        """
+        Plans the next round of question generation.
+
+        Unused chunks come first, evenly spaced over the document, at most one per missing card.
+        Once every chunk has been used, the least explored chunks are widened instead. Beam search is
+        deterministic, so a wider request mostly returns the earlier candidates again plus new
+        ones; the width therefore grows by the number of new candidates needed.
+
+        Args:
+            need (int): The number of cards still missing.
+
+        Returns:
+            list: (chunk index, quota, number of candidates) tuples, in document order, where the
+                  quota is the chunk's share of `need` and the number of candidates covers all
+                  rounds so far. Empty once the document is done, out of rounds, or out of
+                  chunks to use or widen.
+        """
+        if need <= 0 or self.rounds >= self.max_rounds:
+            return []
+        unused = [i for i, width in enumerate(self.widths) if width == 0]
+        if unused:
+            chosen = spread(unused, need)
+        else:
+            widenable = [i for i, width in enumerate(self.widths) if width < self.caps[i]]
+            if not widenable:
+                return []
+            narrowest = min(self.widths[i] for i in widenable)
+            chosen = spread([i for i in widenable if self.widths[i] == narrowest], need)
+
+        self.rounds += 1
+        base, remainder = divmod(need, len(chosen))
+        plan = []
+        for position, chunk_index in enumerate(chosen):
+            quota = base + (1 if position < remainder else 0)
+            if self.max_candidates > 1:
+                self.caps[chunk_index] = max(self.caps[chunk_index], 2 * quota)
+            width = min(self.caps[chunk_index], self.widths[chunk_index] + self.yield_estimate.candidates_for(quota))
+            self.widths[chunk_index] = width
+            plan.append((chunk_index, quota, width))
+        return plan
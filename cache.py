@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+
+
+# Size eviction trims the cache to this share of `max_size_bytes`, so it does not run again on the next write
+_LOW_WATERMARK = 0.9
+
+# Most seconds between two scans for expired entries; reads check expiry themselves in between
+_EXPIRY_SCAN_INTERVAL = 3600
+
+
+class FlashcardCache:
+    def __init__(self, cache_dir=".flashcard_cache", max_size_bytes=256 * 1024 * 1024, max_age_seconds=30 * 24 * 3600):
+        """
+        A disk-backed, content-addressed cache for generated flashcards.
+
+        Entries are stored as one JSON file per key. Reading an entry refreshes its
+        modification time, so size-based eviction removes the least recently used
+        entries first.
+
+        The total size is tracked as entries are written, and the cache directory is only
+        scanned when that estimate crosses `max_size_bytes` or the expiry scan interval has
+        passed, so a write does not cost a pass over every entry.
+
+        Args:
+            cache_dir (str): Directory the cache entries are stored in. Created if missing.
+            max_size_bytes (int): Total size the cache may grow to before old entries are evicted.
+            max_age_seconds (int): Entries not read or written for this long are treated as missing
+                                   and evicted. None disables age-based eviction.
+        """
+        self.cache_dir = cache_dir
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Unknown until the first scan; other processes sharing the directory make it an estimate
+        self._size_bytes = None
+        self._next_expiry_scan = 0.0
+
+
+    @staticmethod
+    def make_key(kind, **parts):
+        """
+        Builds a cache key from a hash of everything that affects the cached value.
+
+        Args:
+            kind (str): The kind of entry, e.g. 'deck' or 'chunk', so different kinds never collide.
+            **parts: JSON-serializable values the entry depends on (text, model IDs, parameters).
+
+        Returns:
+            str: A hex digest usable as a file name.
+        """
+        payload = json.dumps({"kind": kind, **parts}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+
+    def _is_expired(self, mtime, now):
+        return self.max_age_seconds is not None and now - mtime > self.max_age_seconds
+
+
+    def get(self, key):
+        """
+        Looks up a cache entry.
+
+        Args:
+            key (str): A key from `make_key`.
+
+        Returns:
+            The stored value, or None on a miss or an expired or unreadable entry.
+        """
+        path = self._path(key)
+        try:
+            if self._is_expired(os.path.getmtime(path), time.time()):
+                os.remove(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                value = json.load(f)
+            os.utime(path)
+            return value
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Error reading cache entry {key}: {e}")
+            return None
+
+
+    def set(self, key, value, evict=True):
+        """
+        Stores a cache entry, then evicts old entries if the cache is over its limits.
+
+        Args:
+            key (str): A key from `make_key`.
+            value: A JSON-serializable value.
+            evict (bool): Whether to check the eviction watermarks after the write. Callers storing
+                          many entries at once can pass False and call `evict` once at the end.
+        """
+        path = self._path(key)
+        try:
+            try:
+                replaced_size = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced_size = 0
+            # Write to a temporary file first so concurrent readers never see a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            written_size = os.path.getsize(tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing cache entry {key}: {e}")
+            return
+        if self._size_bytes is not None:
+            self._size_bytes += written_size - replaced_size
+        if evict:
+            self.evict()
+
+
+    def evict(self, force=False):
+        """
+        Removes expired entries, then the least recently used ones until the cache is back under
+        `max_size_bytes`. Without `force`, this only scans the cache directory when the tracked
+        size is over the limit (or not known yet) or the expiry scan interval has passed.
+
+        Args:
+            force (bool): Scan the cache directory regardless of the watermarks.
+        """
+        now = time.time()
+        if (not force and self._size_bytes is not None and self._size_bytes <= self.max_size_bytes
+                and now < self._next_expiry_scan):
+            return
+        self._next_expiry_scan = now + (min(_EXPIRY_SCAN_INTERVAL, self.max_age_seconds)
+                                        if self.max_age_seconds is not None else _EXPIRY_SCAN_INTERVAL)
+
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            if self._is_expired(stat.st_mtime, now):
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        if total_size > self.max_size_bytes:
+            for _, size, path in sorted(entries):
+                if total_size <= self.max_size_bytes * _LOW_WATERMARK:
+                    break
+                self._remove(path)
+                total_size -= size
+        self._size_bytes = total_size
+
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".json"):
+                self._remove(os.path.join(self.cache_dir, name))
+        self._size_bytes = 0
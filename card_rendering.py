@@ -0,0 +1,79 @@
+import html
+
+
+# Attractive color palettes for flashcards, cycled through card by card
+FLASHCARD_PALETTES = [
+    {"background_start": "#5D4037", "background_end": "#4E342E", "border": "#3E2723", "question_text": "#FFCCBC", "answer_text": "#D7CCC8", "line_color": "#8D6E63"}, # Deep Brown
+    {"background_start": "#2E7D32", "background_end": "#1B5E20", "border": "#1B5E20", "question_text": "#C8E6C9", "answer_text": "#A5D6A7", "line_color": "#66BB6A"}, # Dark Green
+    {"background_start": "#1565C0", "background_end": "#0D47A1", "border": "#0D47A1", "question_text": "#BBDEFB", "answer_text": "#90CAF9", "line_color": "#42A5F5"}, # Deep Blue
+    {"background_start": "#EF6C00", "background_end": "#E65100", "border": "#E65100", "question_text": "#FFECB3", "answer_text": "#FFCC80", "line_color": "#FFA726"}, # Dark Orange
+    {"background_start": "#C2185B", "background_end": "#AD1457", "border": "#AD1457", "question_text": "#F8BBD0", "answer_text": "#F48FB1", "line_color": "#EC407A"}, # Deep Pink
+    {"background_start": "#6A1B9A", "background_end": "#4A148C", "border": "#4A148C", "question_text": "#E1BEE7", "answer_text": "#CE93D8", "line_color": "#AB47BC"}, # Deep Purple
+    {"background_start": "#558B2F", "background_end": "#33691E", "border": "#33691E", "question_text": "#DCEDC8", "answer_text": "#C5E1A5", "line_color": "#9CCC65"}, # Dark Olive Green
+    {"background_start": "#FBC02D", "background_end": "#F9A825", "border": "#F9A825", "question_text": "#FFFDE7", "answer_text": "#FFF59D", "line_color": "#FFEB3B"}, # Dark Yellow
+]
+
+# Difficulty strip colors: (background, text)
+DIFFICULTY_COLORS = {
+    "Easy": ("white", "black"),
+    "Medium": ("yellow", "black"),
+    "Hard": ("black", "white"),
+}
+
+
+def _deck_css():
+    """Builds one CSS class per palette and difficulty, so each card only needs two class names."""
+    rules = []
+    for i, palette in enumerate(FLASHCARD_PALETTES):
+        rules.append(
+            f".palette-{i} {{ background: linear-gradient(135deg, {palette['background_start']} 0%, "
+            f"{palette['background_end']} 100%); border-color: {palette['border']}; }}\n"
+            f".palette-{i} .flashcard-question {{ color: {palette['question_text']}; }}\n"
+            f".palette-{i} .flashcard-answer {{ color: {palette['answer_text']}; "
+            f"border-top-color: {palette['line_color']}; }}"
+        )
+    for level, (background, text) in DIFFICULTY_COLORS.items():
+        rules.append(f".difficulty-{level.lower()} {{ background-color: {background}; color: {text}; }}")
+    return "<style>\n" + "\n".join(rules) + "\n</style>"
+
+
+# Injected once per page; the per-card markup below then stays small
+DECK_CSS = _deck_css()
+
+_CARD_TEMPLATE = (
+    '<div class="flashcard palette-{palette}">'
+    '<div class="difficulty-strip difficulty-{level}">{label}</div>'
+    '<div class="flashcard-question">Q{number}: {question}</div>'
+    '<div class="flashcard-answer">A{number}: {answer}</div>'
+    '</div>'
+).format
+
+
+def render_deck_html(cards, start=0):
+    """
+    Renders a run of flashcards as one HTML grid, in a single pass.
+
+    Args:
+        cards (iterable): (question, answer, difficulty) tuples.
+        start (int): Index of the first card in the deck, for numbering and palette choice.
+
+    Returns:
+        str: The HTML of the grid, styled by DECK_CSS and the app's flashcard styles.
+    """
+    parts = ['<div class="flashcard-container">']
+    for i, (question, answer, difficulty) in enumerate(cards, start):
+        parts.append(_CARD_TEMPLATE(
+            palette=i % len(FLASHCARD_PALETTES),
+            level=difficulty.lower(),
+            label=html.escape(difficulty.upper()),
+            number=i + 1,
+            question=html.escape(question),
+            answer=html.escape(answer),
+        ))
+    parts.append('</div>')
+    return "".join(parts)
+
+
+def page_count(num_cards, page_size):
+    """Returns the number of pages needed to show `num_cards` cards, at least 1."""
+    return max(1, -(-num_cards // page_size))
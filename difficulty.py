@@ -0,0 +1,84 @@
+import re
+
+import numpy as np
+
+from semantic_dedup import STOPWORDS
+
+
+DIFFICULTY_LEVELS = ("Easy", "Medium", "Hard")
+
+# Weight of each feature in the combined score; every feature is scaled so that 1 is hardest
+FEATURE_WEIGHTS = np.array([
+    0.35,  # the QA model's uncertainty about the answer
+    0.20,  # answer length: long answers are harder to recall
+    0.20,  # share of question terms that do not appear in the passage, i.e. paraphrased questions
+    0.25,  # share of long (7+ letter) words in the question and answer, a readability proxy
+], dtype=np.float32)
+
+# Upper bounds of the combined score for Easy and Medium cards
+DIFFICULTY_THRESHOLDS = np.array([0.30, 0.45], dtype=np.float32)
+
+# Answer length, in words, that counts as maximally hard
+_LONG_ANSWER_WORDS = 12
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+def difficulty_features(questions, answers, contexts, scores):
+    """
+    Computes the difficulty features of a batch of cards.
+
+    Args:
+        questions (list): The card questions.
+        answers (list): The card answers.
+        contexts (list): The passage each answer was extracted from.
+        scores (list): The QA pipeline's confidence score for each answer.
+
+    Returns:
+        np.ndarray: A (len(questions), len(FEATURE_WEIGHTS)) float32 array with values in [0, 1].
+    """
+    question_words = [_words(q) for q in questions]
+    answer_words = [_words(a) for a in answers]
+
+    answer_lengths = np.array([len(words) for words in answer_words], dtype=np.float32)
+    missing_terms = np.zeros(len(questions), dtype=np.float32)
+    for row, (words, context) in enumerate(zip(question_words, contexts)):
+        terms = {w for w in words if w not in STOPWORDS}
+        if terms:
+            context_words = set(_words(context))
+            missing_terms[row] = len(terms - context_words) / len(terms)
+    long_words = np.array([
+        sum(len(w) >= 7 for w in q + a) / max(len(q) + len(a), 1) for q, a in zip(question_words, answer_words)
+    ], dtype=np.float32)
+
+    return np.column_stack([
+        1.0 - np.clip(np.asarray(scores, dtype=np.float32), 0.0, 1.0),
+        np.minimum(answer_lengths / _LONG_ANSWER_WORDS, 1.0),
+        missing_terms,
+        # Even plain prose has a fair share of long words, so half of them counts as maximally hard
+        np.minimum(long_words * 2, 1.0),
+    ]).astype(np.float32)
+
+
+def estimate_difficulty(questions, answers, contexts, scores):
+    """
+    Rates a batch of cards as Easy, Medium or Hard in one vectorized pass.
+
+    The rating depends only on each card's own text and QA score, so it is deterministic
+    and the same whether a card is rated alone or as part of a deck.
+
+    Args:
+        questions (list): The card questions.
+        answers (list): The card answers.
+        contexts (list): The passage each answer was extracted from.
+        scores (list): The QA pipeline's confidence score for each answer.
+
+    Returns:
+        list: One of DIFFICULTY_LEVELS per card.
+    """
+    if not questions:
+        return []
+    combined = difficulty_features(questions, answers, contexts, scores) @ FEATURE_WEIGHTS
+    return [DIFFICULTY_LEVELS[level] for level in np.digitize(combined, DIFFICULTY_THRESHOLDS)]
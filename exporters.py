@@ -0,0 +1,217 @@
+"""
+Writes flashcard decks to CSV, JSONL, Anki-importable TSV, Anki packages (.apkg) and Parquet.
+
+Every writer takes an iterable of Q&A dictionaries and writes rows as they arrive, so a deck
+streamed from `QAGenerator.iter_qa_pairs` goes to disk without being held in memory (Anki
+packages are the exception: the package is built as a whole). pyarrow (Parquet) and genanki
+(.apkg) are only imported when a deck is exported in their format, so they do not slow down
+the app's startup.
+"""
+import csv
+import html
+import io
+import json
+import os
+import zlib
+
+
+EXPORT_FORMATS = ("csv", "jsonl", "anki_tsv", "apkg", "parquet")
+
+FILE_EXTENSIONS = {"csv": "csv", "jsonl": "jsonl", "anki_tsv": "tsv", "apkg": "apkg", "parquet": "parquet"}
+
+MIME_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/jsonl",
+    "anki_tsv": "text/tab-separated-values",
+    "apkg": "application/octet-stream",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+FIELDS = ("question", "answer", "difficulty")
+
+# Rows per Parquet row group: large enough to compress well, small enough to stream
+_PARQUET_ROW_GROUP = 1024
+
+
+def _rows(qa_pairs, source):
+    """Yields each card as a tuple of FIELDS values, prefixed with `source` when it is given."""
+    prefix = (source,) if source is not None else ()
+    for qa in qa_pairs:
+        yield prefix + tuple(qa.get(field, "") for field in FIELDS)
+
+
+def _columns(source):
+    return (("source",) if source is not None else ()) + FIELDS
+
+
+def _text_writer(f):
+    return io.TextIOWrapper(f, encoding="utf-8", newline="")
+
+
+def write_csv(qa_pairs, f, source=None):
+    """
+    Writes a CSV file with a header row.
+    """
+    text = _text_writer(f)
+    try:
+        writer = csv.writer(text)
+        writer.writerow(_columns(source))
+        count = 0
+        for row in _rows(qa_pairs, source):
+            writer.writerow(row)
+            count += 1
+        return count
+    finally:
+        text.flush()
+        text.detach()
+
+
+def write_jsonl(qa_pairs, f, source=None):
+    """
+    Writes one JSON object per line.
+    """
+    text = _text_writer(f)
+    try:
+        columns, count = _columns(source), 0
+        for row in _rows(qa_pairs, source):
+            text.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n")
+            count += 1
+        return count
+    finally:
+        text.flush()
+        text.detach()
+
+
+def write_anki_tsv(qa_pairs, f, source=None):
+    """
+    Writes a file for Anki's "Import File" dialog: front and back as HTML, difficulty as a tag.
+    """
+    text = _text_writer(f)
+    try:
+        text.write("#separator:tab\n#html:true\n#tags column:3\n")
+        count = 0
+        for qa in qa_pairs:
+            front, back = (html.escape(qa[field]).replace("\t", " ").replace("\n", "<br>")
+                           for field in ("question", "answer"))
+            text.write(f"{front}\t{back}\tdifficulty::{qa.get('difficulty', 'unrated').lower()}\n")
+            count += 1
+        return count
+    finally:
+        text.flush()
+        text.detach()
+
+
+def write_apkg(qa_pairs, f, source=None, deck_name="Flashcards"):
+    """
+    Writes an Anki package with one basic note per card, tagged with its difficulty.
+    """
+    import genanki
+
+    # Anki identifies decks and note types by ID; derive them from the name so re-imports update in place
+    deck_id = zlib.crc32(f"deck:{deck_name}".encode("utf-8")) + (1 << 30)
+    model = genanki.Model(
+        zlib.crc32(b"model:flashcard-generator") + (1 << 30),
+        "Flashcard Generator",
+        fields=[{"name": "Question"}, {"name": "Answer"}, {"name": "Difficulty"}],
+        templates=[{
+            "name": "Card 1",
+            "qfmt": "{{Question}}",
+            "afmt": "{{FrontSide}}<hr id=answer>{{Answer}}",
+        }],
+    )
+    deck = genanki.Deck(deck_id, deck_name)
+    for qa in qa_pairs:
+        difficulty = qa.get("difficulty", "")
+        deck.add_note(genanki.Note(
+            model=model,
+            fields=[html.escape(qa["question"]), html.escape(qa["answer"]), difficulty],
+            tags=[f"difficulty::{difficulty.lower()}"] if difficulty else [],
+        ))
+    genanki.Package(deck).write_to_file(f)
+    return len(deck.notes)
+
+
+def write_parquet(qa_pairs, f, source=None):
+    """
+    Writes a Parquet file, one row group per `_PARQUET_ROW_GROUP` cards.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    columns = _columns(source)
+    schema = pa.schema([(name, pa.string()) for name in columns])
+    count, batch = 0, []
+    with pq.ParquetWriter(f, schema) as writer:
+        for row in _rows(qa_pairs, source):
+            batch.append(row)
+            if len(batch) >= _PARQUET_ROW_GROUP:
+                writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema=schema))
+                count, batch = count + len(batch), []
+        if batch or count == 0:
+            writer.write_table(pa.Table.from_pylist([dict(zip(columns, r)) for r in batch], schema=schema))
+            count += len(batch)
+    return count
+
+
+_WRITERS = {
+    "csv": write_csv,
+    "jsonl": write_jsonl,
+    "anki_tsv": write_anki_tsv,
+    "apkg": write_apkg,
+    "parquet": write_parquet,
+}
+
+
+def export_deck(qa_pairs, f, output_format, source=None, **options):
+    """
+    Writes a deck to a binary file object.
+
+    Args:
+        qa_pairs (iterable): Q&A dictionaries with 'question', 'answer' and 'difficulty' keys.
+                             Consumed lazily, so a generator streams straight to the file.
+        f: A binary file object opened for writing.
+        output_format (str): One of EXPORT_FORMATS.
+        source (str): Optional document name, written as an extra 'source' column
+                      (not used by the Anki formats).
+        **options: Format-specific options, e.g. `deck_name` for 'apkg'.
+
+    Returns:
+        int: The number of cards written.
+    """
+    if output_format not in _WRITERS:
+        raise ValueError(f"Unknown export format '{output_format}'. Expected one of {EXPORT_FORMATS}.")
+    return _WRITERS[output_format](qa_pairs, f, source=source, **options)
+
+
+def export_to_path(qa_pairs, path, output_format, source=None, **options):
+    """
+    Writes a deck to a file atomically, so a crash never leaves a partial file behind.
+
+    Takes the same arguments as `export_deck`, with a file path instead of a file object.
+
+    Returns:
+        int: The number of cards written.
+    """
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            count = export_deck(qa_pairs, f, output_format, source=source, **options)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def export_to_bytes(qa_pairs, output_format, source=None, **options):
+    """
+    Renders a deck in memory, e.g. for a download button.
+
+    Takes the same arguments as `export_deck`, without the file object.
+
+    Returns:
+        bytes: The exported deck.
+    """
+    buffer = io.BytesIO()
+    export_deck(qa_pairs, buffer, output_format, source=source, **options)
+    return buffer.getvalue()
@@ -0,0 +1,252 @@
+"""
+Generates flashcard decks for a directory (or glob) of PDF and text documents, without the UI.
+
+Each document's deck is written to its own file in the output directory as soon as it is
+ready. Documents that already have an output file are skipped, so an interrupted run can
+simply be started again. Documents no text could be read from get no output file, so they
+are tried again on the next run.
+
+Usage:
+    python generate_decks.py course_notes/ --output-dir decks/ --format jsonl --num-qa 20
+    python generate_decks.py "syllabus/**/*.pdf" --output-dir decks/ --format csv
+    python generate_decks.py manuals/ --output-dir decks/ --format apkg --stream
+    python generate_decks.py library/ --output-dir decks/ --workers 8 --num-threads 4
+"""
+import argparse
+import glob
+import hashlib
+import itertools
+import os
+import sys
+from collections import Counter
+
+from cache import FlashcardCache
+from exporters import EXPORT_FORMATS, FILE_EXTENSIONS, export_to_path
+from instrumentation import RunStats
+from llm_model import QAGenerator, BACKENDS, DECODING_MODES
+from parallel import ParallelQAGenerator
+from utils import extract_text_from_pdf, iter_pdf_pages, iter_text_blocks, read_text_file, preprocess_text
+
+
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+
+
+def find_documents(inputs):
+    """
+    Expands directories and glob patterns into a sorted list of supported documents.
+
+    Args:
+        inputs (list): Directory paths, file paths or glob patterns.
+
+    Returns:
+        list: Absolute paths of the PDF and text files found, without duplicates.
+    """
+    paths = set()
+    for entry in inputs:
+        if os.path.isdir(entry):
+            candidates = glob.glob(os.path.join(entry, "**", "*"), recursive=True)
+        else:
+            candidates = glob.glob(entry, recursive=True)
+        for path in candidates:
+            if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+                paths.add(os.path.abspath(path))
+    return sorted(paths)
+
+
+def output_paths(documents, output_dir, output_format):
+    """
+    Maps each document to its output file.
+
+    Files are named after the document; a short hash of the full path is added when two
+    documents share a name, so the mapping is stable between runs over the same inputs.
+
+    Args:
+        documents (list): Absolute document paths.
+        output_dir (str): Directory the decks are written to.
+        output_format (str): One of exporters.EXPORT_FORMATS.
+
+    Returns:
+        dict: Document path to output file path.
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in documents]
+    stem_counts = Counter(stems)
+    mapping = {}
+    for path, stem in zip(documents, stems):
+        if stem_counts[stem] > 1:
+            stem = f"{stem}-{hashlib.sha1(path.encode('utf-8')).hexdigest()[:8]}"
+        mapping[path] = os.path.join(output_dir, f"{stem}.{FILE_EXTENSIONS[output_format]}")
+    return mapping
+
+
+def load_document(path, pdf_workers=None):
+    """
+    Extracts and preprocesses the text of a PDF or text document.
+
+    Args:
+        path (str): The document path.
+        pdf_workers (int): Number of processes to extract PDF pages with.
+
+    Returns:
+        str: The preprocessed text, or an empty string if no text could be read.
+    """
+    with open(path, "rb") as f:
+        if path.lower().endswith(".pdf"):
+            text = extract_text_from_pdf(f, workers=pdf_workers)
+        else:
+            text = read_text_file(f)
+    return preprocess_text(text)
+
+
+def generate_streaming(qa_generator, path, output_path, output_format, num_qa, pdf_workers=None):
+    """
+    Generates one document's deck without holding its text or its cards in memory, for very
+    large documents: pages are chunked into a temporary file as they are parsed, and cards are written
+    as they are answered.
+
+    Args:
+        qa_generator (QAGenerator): The generator to use.
+        path (str): The document path.
+        output_path (str): The output file path.
+        output_format (str): One of exporters.EXPORT_FORMATS.
+        num_qa (int): The desired number of Q&A pairs.
+        pdf_workers (int): Number of processes to extract PDF pages with.
+
+    Returns:
+        int: The number of flashcards written, or None if generation failed or no text could be read.
+    """
+    is_pdf = path.lower().endswith(".pdf")
+    with open(path, "rb") as f:
+        pages = iter_pdf_pages(f, workers=pdf_workers) if is_pdf else iter_text_blocks(f)
+        try:
+            stats = RunStats()
+            qa_pairs = qa_generator.iter_qa_pairs_from_pages(pages, num_qa=num_qa, stats=stats, remove_headers=is_pdf)
+            # Reading the first card, if any, reads the whole document, so an empty one is known before writing
+            first = list(itertools.islice(qa_pairs, 1))
+            if not first and not stats.counters.get("chunks"):
+                report_unreadable(path)
+                return None
+            return write_deck(itertools.chain(first, qa_pairs), path, output_path, output_format)
+        except Exception as e:
+            print(f"Error generating flashcards for {path}: {e}")
+            return None
+
+
+def report_unreadable(path):
+    """Reports a document no text could be read from. It gets no output file, so the next run tries it again."""
+    print(f"No text could be read from {path}; no deck written.")
+
+
+def write_deck(qa_pairs, source, output_path, output_format):
+    """
+    Writes one document's deck, atomically, so a crash never leaves a partial file behind.
+
+    Args:
+        qa_pairs (iterable): Q&A dictionaries with 'question', 'answer' and 'difficulty' keys.
+        source (str): The document the deck was generated from.
+        output_path (str): The output file path.
+        output_format (str): One of exporters.EXPORT_FORMATS.
+
+    Returns:
+        int: The number of flashcards written.
+    """
+    if output_format == "apkg":
+        return export_to_path(qa_pairs, output_path, output_format,
+                              deck_name=os.path.splitext(os.path.basename(source))[0])
+    return export_to_path(qa_pairs, output_path, output_format, source=source)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate flashcard decks for a directory of documents.")
+    parser.add_argument("inputs", nargs="+", help="Directories, files or glob patterns of .pdf/.txt documents.")
+    parser.add_argument("--output-dir", required=True, help="Directory the decks are written to.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="jsonl",
+                        help="Output format. anki_tsv and apkg can be imported into Anki.")
+    parser.add_argument("--num-qa", type=int, default=10, help="Number of flashcards per document.")
+    parser.add_argument("--decoding", choices=DECODING_MODES, default="beam",
+                        help="Question generation decoding mode.")
+    parser.add_argument("--backend", choices=BACKENDS, default="fp32",
+                        help="Inference backend for both models; int8 quantizes them for CPU.")
+    parser.add_argument("--num-threads", type=int, default=None,
+                        help="Number of torch threads; per worker with --workers, where it defaults to the "
+                             "number of cores divided by the number of workers.")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of worker processes, each with its own models, that batches of documents are "
+                             "spread across. Not used with --stream.")
+    parser.add_argument("--docs-per-batch", type=int, default=4,
+                        help="Documents whose chunks share QG/QA batches. Decks are written when their batch finishes.")
+    parser.add_argument("--pdf-workers", type=int, default=None,
+                        help="Number of processes to extract PDF pages with. Defaults to extracting in-process.")
+    parser.add_argument("--stream", action="store_true",
+                        help="Process documents one at a time, page by page, so memory use does not grow with "
+                             "document size. Use for very large documents; --docs-per-batch is ignored.")
+    parser.add_argument("--cache-dir", default=None, help="Optional flashcard cache directory.")
+    parser.add_argument("--overwrite", action="store_true", help="Regenerate decks that already have output.")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    documents = find_documents(args.inputs)
+    if not documents:
+        print("No .pdf or .txt documents found.")
+        return 1
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    outputs = output_paths(documents, args.output_dir, args.format)
+    pending = [path for path in documents if args.overwrite or not os.path.exists(outputs[path])]
+    print(f"Found {len(documents)} documents, {len(documents) - len(pending)} already done, {len(pending)} to generate.")
+
+    cache = FlashcardCache(args.cache_dir) if args.cache_dir else None
+    generator_kwargs = dict(decoding=args.decoding, cache=cache, qg_backend=args.backend, qa_backend=args.backend)
+
+    if args.workers > 1 and not args.stream:
+        threads_per_worker = args.num_threads or max(1, (os.cpu_count() or 1) // args.workers)
+        # The documents sent to the workers, in order; filled as the workers ask for more
+        readable = []
+
+        def load_readable():
+            for path in pending:
+                text = load_document(path, args.pdf_workers)
+                if text:
+                    readable.append(path)
+                    yield text
+                else:
+                    report_unreadable(path)
+
+        with ParallelQAGenerator(num_workers=args.workers, threads_per_worker=threads_per_worker,
+                                 **generator_kwargs) as generator:
+            for index, qa_pairs in generator.iter_batch(load_readable(), num_qa=args.num_qa,
+                                                        docs_per_task=args.docs_per_batch):
+                path = readable[index]
+                count = write_deck(qa_pairs, path, outputs[path], args.format)
+                print(f"{count:3d} flashcards -> {outputs[path]}")
+        return 0
+
+    qa_generator = QAGenerator(num_threads=args.num_threads, **generator_kwargs)
+    if args.stream:
+        for path in pending:
+            count = generate_streaming(qa_generator, path, outputs[path], args.format, args.num_qa, args.pdf_workers)
+            if count is not None:
+                print(f"{count:3d} flashcards -> {outputs[path]}")
+        return 0
+
+    for start in range(0, len(pending), args.docs_per_batch):
+        batch, texts = [], []
+        for path in pending[start:start + args.docs_per_batch]:
+            text = load_document(path, args.pdf_workers)
+            if text:
+                batch.append(path)
+                texts.append(text)
+            else:
+                report_unreadable(path)
+        decks = qa_generator.generate_qa_pairs_batch(texts, num_qa=args.num_qa) if texts else []
+
+        for path, qa_pairs in zip(batch, decks):
+            count = write_deck(qa_pairs, path, outputs[path], args.format)
+            print(f"{count:3d} flashcards -> {outputs[path]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
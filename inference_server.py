@@ -0,0 +1,307 @@
+"""
+A small asyncio inference server around QAGenerator.
+
+Requests go into a bounded queue. A scheduler takes the oldest request, waits a short
+window for more to arrive, and runs everything it collected as one
+`generate_qa_pairs_batch` call, so QG and QA work from concurrent users share batches
+instead of queueing behind each other one document at a time. When the queue is full,
+new requests are rejected straight away rather than waiting an unbounded time.
+
+Usage:
+    python inference_server.py --host 127.0.0.1 --port 8765
+
+Clients POST {"text": ..., "num_qa": ..., "decoding": ...} to /generate, or use
+`request_flashcards`. GET /health reports whether the models are loaded.
+"""
+import argparse
+import asyncio
+import functools
+import json
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from llm_model import DECODING_MODES
+
+
+class ServerBusy(Exception):
+    """Raised when the request queue is full."""
+
+
+class InferenceServer:
+    def __init__(self, qa_generator, max_queue_size=64, batch_window=0.05, max_batch_size=8, request_timeout=300.0,
+                 max_num_qa=100):
+        """
+        Wraps a QAGenerator with a bounded request queue and a micro-batching scheduler.
+
+        Args:
+            qa_generator (QAGenerator): The generator that runs the models.
+            max_queue_size (int): Maximum number of requests waiting to be scheduled.
+                                  Further requests fail with ServerBusy.
+            batch_window (float): Seconds to wait after the first queued request for others to join its batch.
+            max_batch_size (int): Maximum number of requests merged into one batch.
+            request_timeout (float): Seconds a request may wait for its result before it fails.
+            max_num_qa (int): Largest `num_qa` a request may ask for.
+        """
+        self.qa_generator = qa_generator
+        self.max_queue_size = max_queue_size
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self.request_timeout = request_timeout
+        self.max_num_qa = max_num_qa
+
+        self._queue = None
+        self._scheduler_task = None
+        # A single model thread: batches run one after another, each using all of torch's threads
+        self._executor = ThreadPoolExecutor(max_workers=1)
+
+
+    async def start(self, warm_up=True):
+        """
+        Starts the scheduler. Must be called from the event loop that serves requests.
+
+        Args:
+            warm_up (bool): Load the models in the background right away.
+        """
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._scheduler_task = asyncio.create_task(self._schedule())
+        if warm_up:
+            asyncio.get_running_loop().run_in_executor(self._executor, self.qa_generator.warm_up)
+
+
+    async def stop(self):
+        """
+        Stops the scheduler and the model thread.
+        """
+        if self._scheduler_task is not None:
+            self._scheduler_task.cancel()
+            try:
+                await self._scheduler_task
+            except asyncio.CancelledError:
+                pass
+        self._executor.shutdown(wait=False)
+
+
+    async def submit(self, text, num_qa=10, decoding=None):
+        """
+        Queues a document and waits for its flashcards.
+
+        Args:
+            text (str): The preprocessed input text.
+            num_qa (int): The desired number of Q&A pairs.
+            decoding (str): The QG decoding mode, or None for the generator's default.
+
+        Returns:
+            list: Q&A dictionaries with 'question', 'answer' and 'difficulty' keys.
+
+        Raises:
+            ServerBusy: If the request queue is full.
+            asyncio.TimeoutError: If the result is not ready within `request_timeout`.
+        """
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((text, num_qa, decoding, future))
+        except asyncio.QueueFull:
+            raise ServerBusy(f"Request queue is full ({self.max_queue_size} waiting).")
+        return await asyncio.wait_for(future, self.request_timeout)
+
+
+    async def _collect_batch(self):
+        """Waits for one request, then gathers whatever else arrives within the batch window."""
+        batch = [await self._queue.get()]
+        if self._queue.qsize() < self.max_batch_size - 1:
+            await asyncio.sleep(self.batch_window)
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        # Skip requests whose caller already gave up
+        return [request for request in batch if not request[3].done()]
+
+
+    async def _schedule(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+
+            # One generate_qa_pairs_batch call per decoding mode; num_qa may differ per document
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[2], []).append(request)
+
+            for decoding, requests in groups.items():
+                run = functools.partial(
+                    self.qa_generator.generate_qa_pairs_batch,
+                    [text for text, _, _, _ in requests],
+                    num_qa=[num_qa for _, num_qa, _, _ in requests],
+                    decoding=decoding,
+                )
+                try:
+                    results = await loop.run_in_executor(self._executor, run)
+                except Exception as e:
+                    print(f"Error generating flashcards for a batch of {len(requests)} requests, "
+                          f"retrying one at a time: {e}")
+                    await self._run_one_by_one(requests, decoding)
+                    continue
+                for (_, _, _, future), qa_pairs in zip(requests, results):
+                    if not future.done():
+                        future.set_result(qa_pairs)
+
+
+    async def _run_one_by_one(self, requests, decoding):
+        """Runs the requests of a failed batch separately, so one bad request only fails itself."""
+        loop = asyncio.get_running_loop()
+        for text, num_qa, _, future in requests:
+            if future.done():
+                continue
+            run = functools.partial(self.qa_generator.generate_qa_pairs_batch, [text], num_qa=[num_qa],
+                                    decoding=decoding)
+            try:
+                qa_pairs = (await loop.run_in_executor(self._executor, run))[0]
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+                continue
+            if not future.done():
+                future.set_result(qa_pairs)
+
+
+    async def _route(self, method, path, body):
+        """Handles one HTTP request and returns (status code, JSON-serializable payload)."""
+        if method == "GET" and path == "/health":
+            return 200, {"ready": self.qa_generator.is_loaded, "queued": self._queue.qsize()}
+        if method != "POST" or path != "/generate":
+            return 404, {"error": f"Unknown endpoint {method} {path}"}
+
+        try:
+            payload = json.loads(body or b"{}")
+            text = payload["text"]
+            num_qa = payload.get("num_qa", 10)
+            decoding = payload.get("decoding")
+        except (ValueError, KeyError, TypeError) as e:
+            return 400, {"error": f"Invalid request body: {e}"}
+        # Checked here, so a bad request is rejected on its own instead of failing the batch it joins
+        if not isinstance(text, str):
+            return 400, {"error": "'text' must be a string."}
+        if isinstance(num_qa, bool) or not isinstance(num_qa, int) or not 1 <= num_qa <= self.max_num_qa:
+            return 400, {"error": f"'num_qa' must be between 1 and {self.max_num_qa}."}
+        if decoding is not None and decoding not in DECODING_MODES:
+            return 400, {"error": f"'decoding' must be one of {DECODING_MODES}."}
+
+        try:
+            return 200, {"qa_pairs": await self.submit(text, num_qa=num_qa, decoding=decoding)}
+        except ServerBusy as e:
+            return 503, {"error": str(e)}
+        except asyncio.TimeoutError:
+            return 504, {"error": "Timed out waiting for flashcards."}
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+
+    async def _handle_connection(self, reader, writer):
+        status, payload = 400, {"error": "Malformed HTTP request"}
+        try:
+            request_line = await reader.readline()
+            method, path, _ = request_line.decode("latin-1").split(" ", 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            status, payload = await self._route(method, path, body)
+        except (ValueError, asyncio.IncompleteReadError):
+            pass
+
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n"
+            .encode("latin-1") + data
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        """
+        Starts the scheduler and serves HTTP requests until cancelled.
+
+        Args:
+            host (str): Interface to listen on.
+            port (int): Port to listen on.
+        """
+        await self.start()
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        print(f"Flashcard inference server listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.stop()
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error",
+            503: "Service Unavailable", 504: "Gateway Timeout"}
+
+
+def request_flashcards(server_url, text, num_qa=10, decoding=None, timeout=300):
+    """
+    Asks a running inference server for flashcards.
+
+    Args:
+        server_url (str): Base URL of the server, e.g. 'http://127.0.0.1:8765'.
+        text (str): The preprocessed input text.
+        num_qa (int): The desired number of Q&A pairs.
+        decoding (str): The QG decoding mode, or None for the server's default.
+        timeout (float): Seconds to wait for the response.
+
+    Returns:
+        list: Q&A dictionaries with 'question', 'answer' and 'difficulty' keys.
+
+    Raises:
+        RuntimeError: If the server rejects the request or fails to generate flashcards.
+    """
+    request = urllib.request.Request(
+        server_url.rstrip("/") + "/generate",
+        data=json.dumps({"text": text, "num_qa": num_qa, "decoding": decoding}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())["qa_pairs"]
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"Flashcard server returned {e.code}: {e.read().decode('utf-8', 'replace')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve flashcard generation over HTTP with request batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-queue-size", type=int, default=64)
+    parser.add_argument("--batch-window", type=float, default=0.05, help="Seconds to wait for requests to batch together.")
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--cache-dir", default=None, help="Optional flashcard cache directory.")
+    args = parser.parse_args()
+
+    from cache import FlashcardCache
+    from llm_model import QAGenerator
+
+    cache = FlashcardCache(args.cache_dir) if args.cache_dir else None
+    server = InferenceServer(
+        QAGenerator(cache=cache),
+        max_queue_size=args.max_queue_size,
+        batch_window=args.batch_window,
+        max_batch_size=args.max_batch_size,
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import time
+
+
+class RunStats:
+    enabled = True
+
+    def __init__(self):
+        """
+        Collects per-stage timings and counters for one generation run.
+
+        Stages are timed with `with stats.stage("qg_generate"): ...`, and counters are
+        incremented with `stats.count("qg_sequences", n)`. Timing the same stage twice,
+        e.g. once per micro-batch, accumulates.
+        """
+        self.timings = {}
+        self.counters = {}
+
+
+    def stage(self, name):
+        """
+        Returns a context manager that adds the time spent inside it to stage `name`.
+        """
+        return _StageTimer(self, name)
+
+
+    def count(self, name, n=1):
+        """
+        Adds `n` to counter `name`.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+
+    def as_dict(self):
+        """
+        Returns the collected timings (in seconds) and counters as plain dictionaries.
+        """
+        return {"timings": dict(self.timings), "counters": dict(self.counters)}
+
+
+class _StageTimer:
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        self.stats.timings[self.name] = self.stats.timings.get(self.name, 0.0) + elapsed
+        return False
+
+
+class _NullStats:
+    """Stands in for RunStats when nobody is listening, so instrumentation costs nothing."""
+
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_TIMER
+
+    def count(self, name, n=1):
+        pass
+
+    def as_dict(self):
+        return {"timings": {}, "counters": {}}
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+NULL_STATS = _NullStats()
+
+
+class PrometheusExporter:
+    def __init__(self, prefix="flashcards"):
+        """
+        A QAGenerator hook that accumulates run statistics and renders them in the
+        Prometheus text exposition format.
+
+        Args:
+            prefix (str): Prefix for every metric name.
+        """
+        self.prefix = prefix
+        self.runs = 0
+        self.stage_seconds = {}
+        self.counters = {}
+
+
+    def __call__(self, stats):
+        """
+        Adds one run's RunStats to the running totals.
+        """
+        self.runs += 1
+        for name, seconds in stats.timings.items():
+            self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + seconds
+        for name, value in stats.counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+
+    def render(self):
+        """
+        Returns the accumulated metrics as Prometheus text.
+        """
+        lines = [
+            f"# TYPE {self.prefix}_runs_total counter",
+            f"{self.prefix}_runs_total {self.runs}",
+            f"# TYPE {self.prefix}_stage_seconds_total counter",
+        ]
+        lines += [f'{self.prefix}_stage_seconds_total{{stage="{name}"}} {seconds:.6f}'
+                  for name, seconds in sorted(self.stage_seconds.items())]
+        lines.append(f"# TYPE {self.prefix}_events_total counter")
+        lines += [f'{self.prefix}_events_total{{event="{name}"}} {value}'
+                  for name, value in sorted(self.counters.items())]
+        return "\n".join(lines) + "\n"
@@ -1,138 +1,1181 @@
-from transformers import T5ForConditionalGeneration, T5Tokenizer
-from transformers import pipeline
-import torch
+import json
+import os
 import re
+import tempfile
+import threading
+from collections import deque
+
+from instrumentation import NULL_STATS, RunStats
+from utils import chunk_text, iter_chunks, iter_preprocessed, iter_sentences
+
+
+# Task prefix expected by the valhalla/t5-*-qg-hl question generation models
+QG_PREFIX = "generate question: "
+
+# Question generation decoding strategies, from most to least expensive per chunk.
+# For a chunk asked for n candidate questions (see budget.QuestionBudget):
+#   "beam"         - beam search with max(2, n) beams, all beams returned. Best single-question
+#                    quality, but cost grows with n and many returned beams are near-duplicates.
+#   "diverse_beam" - group beam search with max(2, n) beams, rounded up to even, in groups of at
+#                    most 2 and a diversity penalty, max(2, n) sequences returned. About the cost
+#                    of "beam" for the same n, far fewer duplicates.
+#   "sample"       - top-k/nucleus sampling of n sequences. Cheaper than beam search per sequence;
+#                    more varied but noisier questions, and not deterministic between runs.
+#   "greedy"       - one greedy decode per chunk. Cheapest by far and cost does not depend on n,
+#                    but yields at most one question per chunk, so it suits long documents.
+DECODING_MODES = ("beam", "diverse_beam", "sample", "greedy")
+
+# Inference backends for each model:
+#   "fp32" - the model as published, in full precision.
+#   "int8" - dynamic int8 quantization of every nn.Linear layer (CPU only). Weights take about a
+#            quarter of the memory and matrix multiplies run faster on CPUs with VNNI/AVX2, at a
+#            small accuracy cost; run benchmarks/backend_parity.py to check it for your content.
+BACKENDS = ("fp32", "int8")
+
+
+def _apply_backend(model, backend, device):
+    """
+    Prepares a loaded model for inference on the given backend.
+
+    Args:
+        model: A transformers PyTorch model.
+        backend (str): One of BACKENDS.
+        device (str): The device the model runs on.
+
+    Returns:
+        The model to run inference with; quantized models are new objects.
+    """
+    import torch
+
+    model.eval()
+    if backend == "int8":
+        if device != "cpu":
+            print(f"int8 dynamic quantization is only supported on CPU, using fp32 on {device}.")
+            return model
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def _timed(pairs, stats, name):
+    """
+    Yields from a generator of Q&A pairs, adding the time spent producing them to stage `name`.
+
+    The time the caller spends between pairs, e.g. rendering a card, is not counted.
+    """
+    try:
+        while True:
+            with stats.stage(name):
+                qa = next(pairs, None)
+            if qa is None:
+                return
+            yield qa
+    finally:
+        pairs.close()
+
+
+class _SpooledChunks:
+    """A document's chunks kept in a temporary file and read back by index, for documents too large to hold in memory."""
+
+    def __init__(self, spool):
+        self.spool = spool
+        # Where each chunk starts in the spool
+        self.offsets = []
+
+
+    def append(self, chunk):
+        self.spool.seek(0, os.SEEK_END)
+        self.offsets.append(self.spool.tell())
+        self.spool.write(json.dumps(chunk) + "\n")
+
+
+    def __len__(self):
+        return len(self.offsets)
+
+
+    def __getitem__(self, chunk_index):
+        self.spool.seek(self.offsets[chunk_index])
+        return json.loads(self.spool.readline())
+
+
+class _DeckRun:
+    """One document's deck in progress, across the rounds of `QAGenerator._iter_rounds`."""
+
+    def __init__(self, doc_index, num_qa, chunks, budget, near_duplicates, passage_index=None, deck_key=None):
+        self.doc_index = doc_index
+        self.num_qa = num_qa
+        self.chunks = chunks
+        self.budget = budget
+        self.near_duplicates = near_duplicates
+        self.passage_index = passage_index
+        self.deck_key = deck_key
+        # Each chunk's candidate questions that have not been tried yet, best first
+        self.questions_per_chunk = [[] for _ in budget.widths]
+        # Chunks questions have been generated from before
+        self.generated_chunks = set()
+        self.seen_questions = set()
+        self.qa_pairs = []
+        # The current round: candidates selected before generating, its plan cut into slices,
+        # how many cards the slices run so far are meant to have produced, and the candidates
+        # newly generated in the current slice
+        self.leftovers = []
+        self.slices = deque()
+        self.target = 0
+        self.slice_candidates = 0
+
+
+    @property
+    def need(self):
+        """The number of cards still missing."""
+        return self.num_qa - len(self.qa_pairs)
 
 
 class QAGenerator:
-    def __init__(self, qg_model_name="valhalla/t5-base-qg-hl", qa_model_name="distilbert-base-uncased-distilled-squad"):
+    def __init__(self, qg_model_name="valhalla/t5-base-qg-hl", qa_model_name="distilbert-base-uncased-distilled-squad",
+                 decoding="beam", cache=None, cache_chunks=True, hooks=None, qg_backend="fp32", qa_backend="fp32",
+                 num_threads=None, near_duplicate_threshold=0.9, near_duplicate_embedder=None, qa_top_k=2,
+                 qa_passage_tokens=192, max_qg_rounds=4):
         """
-        Initializes the Question Generation (QG) and Question Answering (QA) models.
+        Configures the Question Generation (QG) and Question Answering (QA) models.
+        The models themselves are loaded lazily, on first use or by calling `warm_up`.
 
         Args:
             qg_model_name (str): The Hugging Face model ID for question generation.
                                  'valhalla/t5-base-qg-hl' is a good choice for QG from text.
             qa_model_name (str): The Hugging Face model ID for extractive question answering.
                                  'distilbert-base-uncased-distilled-squad' is efficient and effective.
+            decoding (str): The default question generation decoding mode, one of DECODING_MODES.
+            cache (FlashcardCache): Optional cache for generated decks. A hit returns the stored
+                                    Q&A pairs without running either model.
+            cache_chunks (bool): Whether to also cache candidate questions per chunk, so an edited
+                                 document only regenerates the chunks that changed.
+            hooks (list): Callables invoked with the RunStats of every generation run, e.g. a
+                          PrometheusExporter. Without hooks, runs are not instrumented at all.
+            qg_backend (str): Inference backend for the QG model, one of BACKENDS.
+            qa_backend (str): Inference backend for the QA model, one of BACKENDS.
+            num_threads (int): Number of torch intra-op threads. Applies to the whole process;
+                               None keeps torch's default of one thread per core.
+            near_duplicate_threshold (float): Cosine similarity at or above which a generated question
+                                              counts as a paraphrase of an accepted one and is dropped
+                                              before answering. None disables the filter.
+            near_duplicate_embedder: Embeds questions for the near-duplicate filter. Defaults to a
+                                     model-free semantic_dedup.HashingEmbedder; pass a
+                                     semantic_dedup.TransformerEmbedder to also catch rewordings.
+            qa_top_k (int): Number of passages each question is answered against, retrieved from the
+                            whole document with a BM25 index; the most confident answer wins.
+                            None answers each question against the chunk it was generated from.
+            qa_passage_tokens (int): Maximum QA tokenizer tokens per retrievable passage.
+            max_qg_rounds (int): Most rounds of question generation per deck. Each round asks only for the
+                                 cards still missing, sized by the yield of the rounds before it; see
+                                 budget.QuestionBudget.
+        """
+        if decoding not in DECODING_MODES:
+            raise ValueError(f"Unknown decoding mode '{decoding}'. Expected one of {DECODING_MODES}.")
+        for backend in (qg_backend, qa_backend):
+            if backend not in BACKENDS:
+                raise ValueError(f"Unknown backend '{backend}'. Expected one of {BACKENDS}.")
+        self.decoding = decoding
+        self.qg_model_name = qg_model_name
+        self.qa_model_name = qa_model_name
+        self.cache = cache
+        self.cache_chunks = cache_chunks
+        self.hooks = list(hooks or [])
+        self.qg_backend = qg_backend
+        self.qa_backend = qa_backend
+        self.num_threads = num_threads
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.near_duplicate_embedder = near_duplicate_embedder
+        # The HashingEmbedder used when no embedder is given, created with the first index
+        self._default_embedder = None
+        self.qa_top_k = qa_top_k
+        self.qa_passage_tokens = qa_passage_tokens
+        self.max_qg_rounds = max_qg_rounds
+
+        # Models are loaded on first use (see `warm_up`), so creating a generator is instant
+        # and torch/transformers are only imported when inference is actually needed
+        self._device = None
+        self._qg_tokenizer = None
+        self._qg_model = None
+        self._qa_pipeline = None
+        self._load_lock = threading.Lock()
+
+
+    @property
+    def device(self):
+        """The torch device the models run on, 'cuda' if available and 'cpu' otherwise."""
+        if self._device is None:
+            import torch
+
+            if self.num_threads:
+                torch.set_num_threads(self.num_threads)
+            self._device = "cuda" if torch.cuda.is_available() else "cpu"
+            print(f"Using device: {self._device}")
+        return self._device
+
+
+    @property
+    def qg_tokenizer(self):
+        """The QG tokenizer, loaded on first access."""
+        if self._qg_tokenizer is None:
+            with self._load_lock:
+                if self._qg_tokenizer is None:
+                    from transformers import T5Tokenizer
+
+                    self._qg_tokenizer = T5Tokenizer.from_pretrained(self.qg_model_name)
+        return self._qg_tokenizer
+
+
+    @property
+    def qg_model(self):
+        """The QG model, loaded on first access."""
+        if self._qg_model is None:
+            with self._load_lock:
+                if self._qg_model is None:
+                    from transformers import T5ForConditionalGeneration
+
+                    model = T5ForConditionalGeneration.from_pretrained(self.qg_model_name).to(self.device)
+                    self._qg_model = _apply_backend(model, self.qg_backend, self.device)
+                    print(f"Initialized QG model: {self.qg_model_name} ({self.qg_backend}) on {self.device}")
+        return self._qg_model
+
+
+    @property
+    def qa_pipeline(self):
+        """The QA pipeline, loaded on first access."""
+        if self._qa_pipeline is None:
+            with self._load_lock:
+                if self._qa_pipeline is None:
+                    from transformers import AutoModelForQuestionAnswering, pipeline
+
+                    model = AutoModelForQuestionAnswering.from_pretrained(self.qa_model_name)
+                    self._qa_pipeline = pipeline(
+                        "question-answering",
+                        model=_apply_backend(model, self.qa_backend, self.device),
+                        tokenizer=self.qa_model_name,
+                        device=0 if self.device == "cuda" else -1 # 0 for first GPU, -1 for CPU
+                    )
+                    print(f"Initialized QA model: {self.qa_model_name} ({self.qa_backend}) on {self.device}")
+        return self._qa_pipeline
+
+
+    @property
+    def is_loaded(self):
+        """Whether both models have been loaded, e.g. for a readiness probe."""
+        return self._qg_model is not None and self._qa_pipeline is not None
+
+
+    def warm_up(self, run_inference=True):
+        """
+        Loads both models ahead of the first request.
+
+        Call this from a background thread or readiness probe so a fresh worker can serve
+        its first user without paying the model loading cost.
+
+        Args:
+            run_inference (bool): Also run one tiny QG and QA pass, so lazily initialized
+                                  kernels and caches are ready too.
+
+        Returns:
+            bool: True once the models are loaded.
+        """
+        for component in ("qg_tokenizer", "qg_model", "qa_pipeline"):
+            getattr(self, component)
+
+        if run_inference:
+            sample = "Photosynthesis is the process plants use to turn light energy into chemical energy."
+            self._generate_questions([sample], [1], max_qg_length=64, decoding="greedy")
+            self._run_qa([{"question": "What is photosynthesis?", "context": sample}], max_qa_answer_length=30)
+        return self.is_loaded
+
+
+    def _count_qg_tokens(self, text):
+        """Returns the number of QG tokenizer tokens in `text`, without special tokens."""
+        return len(self.qg_tokenizer.encode(text, add_special_tokens=False))
+
+
+    def _count_qa_tokens(self, text):
+        """Returns the number of QA tokenizer tokens in `text`, without special tokens."""
+        return len(self.qa_pipeline.tokenizer.encode(text, add_special_tokens=False))
+
+
+    def chunk_text(self, text, max_qg_length=512, chunk_overlap=1):
+        """
+        Splits text into sentence-aligned windows that fit the QG model's input budget.
+
+        Args:
+            text (str): The preprocessed input text.
+            max_qg_length (int): Maximum token length for a single QG input, including the task prefix.
+            chunk_overlap (int): Number of sentences repeated between consecutive chunks.
+
+        Returns:
+            list: A list of chunk strings, in document order.
+        """
+        return chunk_text(text, self._count_qg_tokens, max_tokens=self._qg_chunk_budget(max_qg_length),
+                          overlap_sentences=chunk_overlap)
+
+
+    def _qg_chunk_budget(self, max_qg_length):
+        """Returns the number of text tokens a chunk may hold, leaving room for the task prefix and EOS token."""
+        return max_qg_length - self._count_qg_tokens(QG_PREFIX) - 1
+
+
+    @staticmethod
+    def _allocate_questions(num_qa, num_chunks):
+        """
+        Spreads the question budget across chunks, giving every chunk at least one question.
+
+        Args:
+            num_qa (int): The desired number of Q&A pairs.
+            num_chunks (int): The number of chunks the document was split into.
+
+        Returns:
+            list: The number of questions to request from each chunk.
+        """
+        base, remainder = divmod(max(num_qa, num_chunks), num_chunks)
+        return [base + (1 if i < remainder else 0) for i in range(num_chunks)]
+
+
+    @staticmethod
+    def _decoding_kwargs(decoding, num_candidates):
+        """
+        Builds the `generate` arguments for a decoding mode and number of candidate questions.
+
+        Args:
+            decoding (str): One of DECODING_MODES.
+            num_candidates (int): The number of candidate questions wanted from the chunk.
+                                  Greedy decoding always returns one.
+
+        Returns:
+            dict: Keyword arguments for `T5ForConditionalGeneration.generate`, including
+                  `num_return_sequences`.
+        """
+        if decoding == "beam":
+            num_beams = max(2, num_candidates)
+            return {"num_beams": num_beams, "num_return_sequences": num_beams,
+                    "early_stopping": True, "length_penalty": 0.8}
+        if decoding == "diverse_beam":
+            num_return_sequences = max(2, num_candidates)
+            # Groups of 2 beams need an even number of beams; 2 beams still make 2 groups of one
+            num_beams = num_return_sequences + num_return_sequences % 2
+            num_beam_groups = max(2, num_beams // 2)
+            return {"num_beams": num_beams, "num_beam_groups": num_beam_groups, "diversity_penalty": 1.0,
+                    "num_return_sequences": num_return_sequences, "early_stopping": True, "length_penalty": 0.8}
+        if decoding == "sample":
+            return {"do_sample": True, "top_k": 50, "top_p": 0.95,
+                    "num_return_sequences": num_candidates}
+        if decoding == "greedy":
+            return {"num_beams": 1, "num_return_sequences": 1}
+        raise ValueError(f"Unknown decoding mode '{decoding}'. Expected one of {DECODING_MODES}.")
+
+
+    def _generate_questions(self, chunks, num_candidates, max_qg_length, qg_batch_size=8, decoding="beam",
+                            stats=NULL_STATS):
+        """
+        Generates candidate questions for many chunks with batched decoding.
+
+        Chunks that need the same decoding arguments are padded to a common length and
+        run through `generate` together in micro-batches of `qg_batch_size`.
+
+        Args:
+            chunks (list): Windows of input text that fit the QG model's context.
+            num_candidates (list): The number of candidate questions wanted from each chunk.
+            max_qg_length (int): Maximum token length for the input to the question generation model.
+            qg_batch_size (int): Maximum number of chunks per `generate` call.
+            decoding (str): The decoding mode, one of DECODING_MODES.
+            stats (RunStats): Collects timings and counters for the run.
+
+        Returns:
+            list: For each chunk, the decoded candidate questions, best first.
+        """
+        import torch
+
+        questions_per_chunk = [[] for _ in chunks]
+        kwargs_per_chunk = [self._decoding_kwargs(decoding, n) for n in num_candidates]
+
+        # Reuse questions for chunks that were already seen, e.g. the unchanged parts of an edited document
+        chunk_cache_keys = [None] * len(chunks)
+        pending = range(len(chunks))
+        if self.cache is not None and self.cache_chunks:
+            pending = []
+            for i, chunk in enumerate(chunks):
+                chunk_cache_keys[i] = self.cache.make_key(
+                    "chunk",
+                    text=chunk,
+                    qg_model=self.qg_model_name,
+                    qg_backend=self.qg_backend,
+                    max_qg_length=max_qg_length,
+                    decoding_kwargs=kwargs_per_chunk[i],
+                )
+                with stats.stage("chunk_cache_lookup"):
+                    cached_questions = self.cache.get(chunk_cache_keys[i])
+                if cached_questions is not None:
+                    questions_per_chunk[i] = cached_questions
+                    stats.count("chunk_cache_hits")
+                else:
+                    pending.append(i)
+
+        # generate() takes one set of decoding arguments per call, so group chunks by them
+        keys_per_chunk = [tuple(sorted(kwargs.items())) for kwargs in kwargs_per_chunk]
+        order = sorted(pending, key=lambda i: keys_per_chunk[i])
+
+        start = 0
+        while start < len(order):
+            key = keys_per_chunk[order[start]]
+            batch = [order[start]]
+            start += 1
+            while start < len(order) and len(batch) < qg_batch_size and keys_per_chunk[order[start]] == key:
+                batch.append(order[start])
+                start += 1
+
+            # Pad the micro-batch to a common length; chunking keeps it within budget, truncation is a safety net
+            with stats.stage("qg_tokenize"):
+                inputs = self.qg_tokenizer(
+                    [QG_PREFIX + chunks[i] for i in batch],
+                    max_length=max_qg_length,
+                    truncation=True,
+                    padding=True,
+                    return_tensors="pt"
+                ).to(self.device)
+
+            decoding_kwargs = kwargs_per_chunk[batch[0]]
+            with stats.stage("qg_generate"), torch.inference_mode():
+                generated_ids = self.qg_model.generate(
+                    inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    max_length=64,
+                    no_repeat_ngram_size=2,
+                    **decoding_kwargs
+                )
+
+            # Sequences come back grouped per input, num_return_sequences at a time
+            num_returned = decoding_kwargs["num_return_sequences"]
+            with stats.stage("qg_decode"):
+                decoded = self.qg_tokenizer.batch_decode(generated_ids, skip_special_tokens=True)
+
+            if stats.enabled:
+                stats.count("qg_batches")
+                stats.count("qg_input_tokens", int(inputs["attention_mask"].sum()))
+                stats.count("qg_padded_tokens", int(inputs["attention_mask"].numel()))
+                stats.count("qg_beams", decoding_kwargs.get("num_beams", 1) * len(batch))
+                stats.count("qg_sequences", len(decoded))
+                stats.count("qg_output_tokens", int(generated_ids.numel()))
+            for position, chunk_index in enumerate(batch):
+                group = decoded[position * num_returned:(position + 1) * num_returned]
+                questions_per_chunk[chunk_index] = [q.strip() for q in group]
+                if chunk_cache_keys[chunk_index] is not None:
+                    self.cache.set(chunk_cache_keys[chunk_index], questions_per_chunk[chunk_index], evict=False)
+
+        if self.cache is not None and self.cache_chunks and order:
+            self.cache.evict()
+
+        return questions_per_chunk
+
+
+    @staticmethod
+    def _normalize_question(question):
+        """Returns a generated question with its whitespace collapsed, and its form for duplicate checks."""
+        cleaned = ' '.join(question.replace('\n', ' ').split())
+        return cleaned, re.sub(r'[^\w\s]', '', cleaned).lower().strip()
+
+
+    @staticmethod
+    def _select_questions(questions_per_chunk, num_qa, stats=NULL_STATS, seen_questions=None, warn=True,
+                          near_duplicates=None):
+        """
+        Picks unique, well-formed questions, taking candidates from the chunks in turn
+        so the deck covers the whole document. Exact duplicates are dropped after normalizing
+        punctuation and case; paraphrases are dropped by the optional near-duplicate index.
+
+        Args:
+            questions_per_chunk (list): For each chunk, its candidate questions, best first.
+            num_qa (int): The desired number of questions.
+            stats (RunStats): Collects the number of candidates dropped by each filter.
+            seen_questions (set): Normalized questions already accepted or rejected as near-duplicates,
+                                  e.g. in earlier rounds. Updated in place with this call's decisions.
+            warn (bool): Whether to warn when fewer than `num_qa` questions were found.
+            near_duplicates (NearDuplicateIndex): Optional index of accepted questions; candidates
+                                                  too similar to an accepted one are dropped.
+
+        Returns:
+            list: (question, chunk_index) tuples for the selected questions.
+        """
+        questions = []
+        for rank in range(max((len(qs) for qs in questions_per_chunk), default=0)):
+            for chunk_index, qs in enumerate(questions_per_chunk):
+                if rank < len(qs):
+                    questions.append((qs[rank], chunk_index))
+
+
+        # Filter for unique and non-empty questions
+        candidates, batch_seen = [], set()
+        seen_questions = set() if seen_questions is None else seen_questions
+        for q, chunk_index in questions:
+            cleaned_q, normalized_q_for_check = QAGenerator._normalize_question(q)
+
+            if cleaned_q and normalized_q_for_check not in seen_questions and normalized_q_for_check not in batch_seen and "?" in cleaned_q: 
+                candidates.append((cleaned_q, chunk_index, normalized_q_for_check))
+                batch_seen.add(normalized_q_for_check) 
+                if near_duplicates is None and len(candidates) >= num_qa:
+                    break
+            elif stats.enabled:
+                if not cleaned_q:
+                    stats.count("questions_dropped_empty")
+                elif "?" not in cleaned_q:
+                    stats.count("questions_dropped_not_a_question")
+                else:
+                    stats.count("questions_dropped_duplicate")
+
+        # Drop paraphrases of questions already accepted, before they cost a QA pass
+        if near_duplicates is not None and candidates:
+            with stats.stage("near_duplicate_filter"):
+                decisions = near_duplicates.add([q for q, _, _ in candidates], limit=num_qa)
+            stats.count("questions_dropped_near_duplicate", sum(1 for d in decisions if d is False))
+            seen_questions.update(c[2] for c, accepted in zip(candidates, decisions) if accepted is False)
+            candidates = [c for c, accepted in zip(candidates, decisions) if accepted]
+
+        candidates = candidates[:num_qa]
+        seen_questions.update(normalized for _, _, normalized in candidates)
+        unique_questions = [(q, chunk_index) for q, chunk_index, _ in candidates]
+
+        if stats.enabled:
+            stats.count("questions_candidates", len(questions))
+            stats.count("questions_selected", len(unique_questions))
+
+
+        # If not enough unique questions are generated, try generating more or adjust parameters
+        if warn and len(unique_questions) < num_qa and num_qa > 0:
+            print(f"Warning: Only {len(unique_questions)} unique questions generated, targeting {num_qa}. "
+                  f"Consider increasing input text length, adjusting parameters (e.g., max_qg_rounds), or "
+                  f"providing more diverse input content.")
+
+        return unique_questions
+
+
+    def _store_candidates(self, run, chunk_index, questions):
+        """
+        Stores the candidates just generated from a chunk and returns how many of them are new.
+
+        A widened chunk returns its earlier candidates again, along with the new ones. Those
+        already tried or still waiting are not counted, so they do not lower the measured yield.
+
+        Args:
+            run (_DeckRun): The deck in progress.
+            chunk_index (int): The chunk the questions were generated from.
+            questions (list): The generated questions, best first.
+
+        Returns:
+            int: The number of candidates not generated from this chunk before.
+        """
+        num_new = len(questions)
+        if chunk_index in run.generated_chunks:
+            waiting = {self._normalize_question(question)[1] for question in run.questions_per_chunk[chunk_index]}
+            for question in questions:
+                normalized = self._normalize_question(question)[1]
+                if normalized in waiting or normalized in run.seen_questions:
+                    num_new -= 1
+        run.generated_chunks.add(chunk_index)
+        run.questions_per_chunk[chunk_index] = questions
+        return num_new
+
+
+    def _select_run_questions(self, run, num_questions, stats=NULL_STATS):
+        """
+        Selects up to `num_questions` new questions from a deck's stored candidates, then drops the
+        candidates that can no longer be selected, so later rounds only look at untried ones.
+
+        Args:
+            run (_DeckRun): The deck in progress.
+            num_questions (int): The number of questions wanted.
+            stats (RunStats): Collects timings and counters for the run.
+
+        Returns:
+            list: (question, chunk_index) tuples for the selected questions.
+        """
+        with stats.stage("dedup"):
+            unique_questions = self._select_questions(run.questions_per_chunk, num_questions, stats,
+                                                      seen_questions=run.seen_questions, warn=False,
+                                                      near_duplicates=run.near_duplicates)
+            for chunk_index, questions in enumerate(run.questions_per_chunk):
+                untried = []
+                for question in questions:
+                    cleaned, normalized = self._normalize_question(question)
+                    if "?" in cleaned and normalized not in run.seen_questions:
+                        untried.append(question)
+                run.questions_per_chunk[chunk_index] = untried
+        return unique_questions
+
+
+    def _run_qa(self, qa_inputs, max_qa_answer_length, qa_batch_size=16, stats=NULL_STATS):
+        """
+        Runs the QA pipeline over many question/context pairs in one batched call.
+
+        If the batched call fails, falls back to answering the questions one at a time
+        so a single bad input does not lose the whole deck.
+
+        Args:
+            qa_inputs (list): Dictionaries with 'question' and 'context' keys.
+            max_qa_answer_length (int): Maximum token length for the generated answer.
+            qa_batch_size (int): Number of question/context pairs per forward pass.
+            stats (RunStats): Collects timings and counters for the run.
+
+        Returns:
+            list: One pipeline result dictionary per input, or None where answering failed.
+        """
+        if not qa_inputs:
+            return []
+        stats.count("qa_inputs", len(qa_inputs))
+
+        try:
+            with stats.stage("qa"):
+                results = self.qa_pipeline(
+                    qa_inputs,
+                    batch_size=qa_batch_size,
+                    max_answer_len=max_qa_answer_length,
+                    handle_impossible_answer=True,
+                )
+            # The pipeline unwraps single-element inputs
+            return [results] if isinstance(results, dict) else list(results)
+        except Exception as e:
+            print(f"Error generating answers in batch, retrying one at a time: {e}")
+            stats.count("qa_batch_failures")
+
+        results = []
+        for qa_input in qa_inputs:
+            try:
+                with stats.stage("qa"):
+                    results.append(self.qa_pipeline(
+                        question=qa_input["question"],
+                        context=qa_input["context"],
+                        max_answer_len=max_qa_answer_length,
+                        handle_impossible_answer=True,
+                    ))
+            except Exception as e:
+                print(f"Error generating answer for question '{qa_input['question']}': {e}")
+                results.append(None)
+        return results
+
+
+    def _build_passage_index(self, text, max_qa_context_length, stats=NULL_STATS):
+        """
+        Splits a document into short passages and indexes them for retrieval.
+
+        Args:
+            text (str): The preprocessed input text.
+            max_qa_context_length (int): Maximum token length for the context provided to the QA model.
+            stats (RunStats): Collects timings and counters for the run.
+
+        Returns:
+            PassageIndex: The document's passage index, or None when retrieval is disabled.
+        """
+        if self.qa_top_k is None:
+            return None
+        from retrieval import PassageIndex
+
+        with stats.stage("retrieval_index"):
+            passages = chunk_text(text, self._count_qa_tokens,
+                                  max_tokens=min(self.qa_passage_tokens, max_qa_context_length), overlap_sentences=1)
+            passage_index = PassageIndex(passages)
+        stats.count("qa_passages", len(passages))
+        return passage_index
+
+
+    def _qa_inputs(self, unique_questions, chunks, passage_index, stats=NULL_STATS):
+        """
+        Pairs each question with the contexts to answer it against.
+
+        With a passage index, those are the question's top `qa_top_k` passages; without one,
+        or when no passage shares a term with the question, the chunk it was generated from.
+
+        Args:
+            unique_questions (list): (question, chunk_index) tuples.
+            chunks (list): The chunks the questions were generated from.
+            passage_index (PassageIndex): The document's passage index, or None.
+            stats (RunStats): Collects timings and counters for the run.
+
+        Returns:
+            tuple: (QA pipeline inputs, number of inputs for each question).
+        """
+        qa_inputs, counts = [], []
+        with stats.stage("retrieval"):
+            for question, chunk_index in unique_questions:
+                passage_ids = passage_index.search(question, self.qa_top_k) if passage_index is not None else []
+                contexts = [passage_index.passages[i] for i in passage_ids] or [chunks[chunk_index]]
+                qa_inputs.extend({"question": question, "context": context} for context in contexts)
+                counts.append(len(contexts))
+        return qa_inputs, counts
+
+
+    @staticmethod
+    def _best_answers(qa_inputs, answer_results, counts):
+        """
+        Reduces the QA results of each question's contexts to its most confident non-empty answer.
+
+        Args:
+            qa_inputs (list): The QA pipeline inputs, grouped by question as returned by `_qa_inputs`.
+            answer_results (list): The QA pipeline result for each input, or None.
+            counts (list): Number of inputs belonging to each question.
+
+        Returns:
+            list: One result per question, with the 'context' it was answered from added,
+                  or None where every context failed.
         """
-      
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        print(f"Using device: {self.device}")
-
-        
-        self.qg_tokenizer = T5Tokenizer.from_pretrained(qg_model_name)
-        self.qg_model = T5ForConditionalGeneration.from_pretrained(qg_model_name).to(self.device)
-        print(f"Initialized QG model: {qg_model_name} on {self.device}")
-
-    
-        self.qa_pipeline = pipeline(
-            "question-answering",
-            model=qa_model_name,
-            tokenizer=qa_model_name,
-            device=0 if self.device == "cuda" else -1 # 0 for first GPU, -1 for CPU
+        best, offset = [], 0
+        for count in counts:
+            candidates = [dict(result, context=qa_input["context"])
+                          for qa_input, result in zip(qa_inputs[offset:offset + count],
+                                                      answer_results[offset:offset + count]) if result]
+            offset += count
+            best.append(max(candidates, key=lambda r: (bool(r["answer"].strip()), r["score"]), default=None))
+        return best
+
+
+    @staticmethod
+    def _collect_qa_pairs(unique_questions, answer_results, num_qa, stats=NULL_STATS):
+        """
+        Keeps the valid Q&A pairs from the QA pipeline results and rates their difficulty.
+
+        Difficulty is estimated for all kept pairs in one vectorized pass, from signals the
+        pipeline already has (see `difficulty.estimate_difficulty`), so it adds no model call.
+
+        Args:
+            unique_questions (list): (question, chunk_index) tuples, in the order they were answered.
+            answer_results (list): The best QA result for each question, as returned by `_best_answers`, or None.
+            num_qa (int): The desired number of Q&A pairs.
+            stats (RunStats): Collects the number of answers rejected by each check.
+
+        Returns:
+            list: A list of dictionaries with 'question', 'answer' and 'difficulty' keys.
+        """
+        qa_pairs, kept_results = [], []
+        for (question, _), answer_result in zip(unique_questions, answer_results):
+            if not answer_result:
+                stats.count("answers_failed")
+                continue
+            answer = answer_result['answer'].strip()
+            cleaned_answer = ' '.join(answer.replace('\n', ' ').split())
+
+            if cleaned_answer and cleaned_answer.lower() not in ["no answer", ""] and len(cleaned_answer) > 3 and cleaned_answer.lower() != question.lower():
+                qa_pairs.append({"question": question, "answer": cleaned_answer})
+                kept_results.append(answer_result)
+                if len(qa_pairs) >= num_qa: 
+                    break
+            elif stats.enabled:
+                if not cleaned_answer or cleaned_answer.lower() == "no answer":
+                    stats.count("answers_rejected_empty")
+                elif len(cleaned_answer) <= 3:
+                    stats.count("answers_rejected_too_short")
+                else:
+                    stats.count("answers_rejected_repeats_question")
+
+        if qa_pairs:
+            from difficulty import estimate_difficulty
+
+            with stats.stage("difficulty"):
+                levels = estimate_difficulty(
+                    [qa["question"] for qa in qa_pairs],
+                    [qa["answer"] for qa in qa_pairs],
+                    [result["context"] for result in kept_results],
+                    [result["score"] for result in kept_results],
+                )
+            for qa, level in zip(qa_pairs, levels):
+                qa["difficulty"] = level
+        stats.count("cards", len(qa_pairs))
+        return qa_pairs
+
+
+    def _new_near_duplicate_index(self):
+        """Returns an empty index for one deck's near-duplicate filter, or None when it is disabled."""
+        if self.near_duplicate_threshold is None:
+            return None
+        from semantic_dedup import HashingEmbedder, NearDuplicateIndex
+
+        embedder = self.near_duplicate_embedder
+        if embedder is None:
+            if self._default_embedder is None:
+                self._default_embedder = HashingEmbedder()
+            embedder = self._default_embedder
+        return NearDuplicateIndex(embedder, self.near_duplicate_threshold)
+
+
+    def _notify_hooks(self, stats):
+        """Passes a finished run's RunStats to every hook; a failing hook never fails the run."""
+        for hook in self.hooks:
+            try:
+                hook(stats)
+            except Exception as e:
+                print(f"Error in instrumentation hook {hook!r}: {e}")
+
+
+    def _deck_cache_key(self, text, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length,
+                        chunk_overlap, qg_batch_size, decoding):
+        """Builds the cache key of a whole deck from everything that affects its contents."""
+        return self.cache.make_key(
+            "deck",
+            text=text,
+            qg_model=self.qg_model_name,
+            qa_model=self.qa_model_name,
+            qg_backend=self.qg_backend,
+            qa_backend=self.qa_backend,
+            num_qa=num_qa,
+            max_qg_length=max_qg_length,
+            max_qa_context_length=max_qa_context_length,
+            max_qa_answer_length=max_qa_answer_length,
+            chunk_overlap=chunk_overlap,
+            decoding=decoding,
+            near_duplicate_threshold=self.near_duplicate_threshold,
+            # Keyed on the configuration, not on the embedder object, which may not exist yet
+            near_duplicate_embedder=(None if self.near_duplicate_embedder is None else
+                                     [type(self.near_duplicate_embedder).__name__,
+                                      getattr(self.near_duplicate_embedder, "model_name", None)]),
+            qa_top_k=self.qa_top_k,
+            qa_passage_tokens=self.qa_passage_tokens,
+            max_qg_rounds=self.max_qg_rounds,
+            # Rounds run in slices of qg_batch_size chunks, and each slice selects its own share of questions
+            qg_batch_size=qg_batch_size,
+            card_fields=("question", "answer", "difficulty"),
         )
-        print(f"Initialized QA model: {qa_model_name} on {self.device}")
 
 
-    def generate_qa_pairs(self, text, num_qa=10, max_qg_length=512, max_qa_context_length=512, max_qa_answer_length=200):
+    def generate_qa_pairs(self, text, num_qa=10, max_qg_length=512, max_qa_context_length=512, max_qa_answer_length=200,
+                          chunk_overlap=1, qg_batch_size=8, qa_batch_size=16, decoding=None,
+                          stats=None):
         """
         Generates a list of question-answer pairs from the given text.
 
         The process involves:
-        1. Using the QG model to generate candidate questions from the input text.
-        2. Filtering for unique and valid questions.
-        3. Using the QA model to find answers to each generated question within the original text.
+        1. Splitting the text into sentence-aligned chunks that fit the QG model's context.
+        2. Using the QG model to generate candidate questions from chunks spread over the document,
+           in batches, with the selected decoding mode.
+        3. Filtering for unique and valid questions, taking them from the chunks in turn.
+        4. Using the QA model to answer all questions in one batched call, each against its best passages.
+        5. Repeating 2-4 for the cards still missing, from unused chunks or with more candidates per
+           chunk, until `num_qa` cards exist or `max_qg_rounds` rounds have run.
 
         Args:
             text (str): The input educational content from which to generate Q&A.
             num_qa (int): The desired number of Q&A pairs to generate.
-            max_qg_length (int): Maximum token length for the input to the question generation model.
-                                 Longer texts will be truncated.
+            max_qg_length (int): Maximum token length for each chunk passed to the question generation model.
             max_qa_context_length (int): Maximum token length for the context provided to the
                                         question answering model.
             max_qa_answer_length (int): Maximum token length for the generated answer from the
                                         question answering model.
+            chunk_overlap (int): Number of sentences shared between consecutive chunks.
+            qg_batch_size (int): Maximum number of chunks passed to the QG model in one `generate` call.
+            qa_batch_size (int): Number of question/context pairs per QA forward pass.
+            decoding (str): The question generation decoding mode, one of DECODING_MODES.
+                            Defaults to the mode the generator was created with.
+            stats (RunStats): Optional RunStats to record per-stage timings and counters into,
+                              e.g. to show a breakdown of this run. The generator's hooks
+                              receive it too.
 
         Returns:
-            list: A list of dictionaries, where each dictionary contains 'question' (str) and 'answer' (str).
+            list: A list of dictionaries, where each dictionary contains 'question' (str), 'answer' (str)
+                  and 'difficulty' (one of difficulty.DIFFICULTY_LEVELS).
                   Returns an empty list if no Q&A pairs can be generated.
         """
-        qa_pairs = []
+        return self.generate_qa_pairs_batch(
+            [text],
+            num_qa=num_qa,
+            max_qg_length=max_qg_length,
+            max_qa_context_length=max_qa_context_length,
+            max_qa_answer_length=max_qa_answer_length,
+            chunk_overlap=chunk_overlap,
+            qg_batch_size=qg_batch_size,
+            qa_batch_size=qa_batch_size,
+            decoding=decoding,
+            stats=stats,
+        )[0]
+
+
+    def iter_qa_pairs(self, text, num_qa=10, max_qg_length=512, max_qa_context_length=512, max_qa_answer_length=200,
+                      chunk_overlap=1, qg_batch_size=8, qa_batch_size=16, decoding=None, stats=None):
+        """
+        Yields question-answer pairs from the given text as soon as each one is answered.
+
+        Runs the same rounds as `generate_qa_pairs`, so both return the same deck, but yields
+        the cards of each slice of `qg_batch_size` chunks as soon as it is answered (see
+        `_iter_rounds`), and stops as soon as `num_qa` pairs have been yielded.
+
+        Takes the same arguments as `generate_qa_pairs`.
+
+        Yields:
+            dict: A Q&A dictionary with 'question', 'answer' and 'difficulty' keys.
+        """
+        run_stats = stats if stats is not None else (RunStats() if self.hooks else NULL_STATS)
+        try:
+            yield from _timed(self._iter_qa_pairs(
+                text, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length, chunk_overlap,
+                qg_batch_size, qa_batch_size, decoding or self.decoding, run_stats,
+            ), run_stats, "total")
+        finally:
+            self._notify_hooks(run_stats)
+
+
+    def _iter_qa_pairs(self, text, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length, chunk_overlap,
+                       qg_batch_size, qa_batch_size, decoding, stats):
+        """Runs the pipeline behind `iter_qa_pairs`, recording into `stats`."""
+        deck, run = self._start_deck(0, text, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length,
+                                     chunk_overlap, qg_batch_size, decoding, stats)
+        if run is None:
+            yield from deck
+            return
+        for _, new_pairs in self._iter_rounds([run], max_qg_length, max_qa_context_length, max_qa_answer_length,
+                                              qg_batch_size, qa_batch_size, decoding, stats):
+            yield from new_pairs
+        self._finish_deck(run)
+
+
+    def iter_qa_pairs_from_pages(self, pages, num_qa=10, max_qg_length=512, max_qa_context_length=512,
+                                 max_qa_answer_length=200, chunk_overlap=1, qg_batch_size=8, qa_batch_size=16,
+                                 decoding=None, stats=None, remove_headers=False):
+        """
+        Yields question-answer pairs from a document given as a stream of raw pages, for documents
+        too large to hold in memory.
+
+        Pages are preprocessed and chunked as they arrive, and the chunks are spooled to a temporary
+        file so the question budget can still be spread over the whole document. Question generation
+        therefore starts only once the last page has been chunked; the rounds then run as in
+        `iter_qa_pairs`, reading back only the chunks of the current slice. Memory use therefore
+        depends on the chunk and slice size, not on the length of the document. Unlike
+        `iter_qa_pairs`, answers are retrieved from the passages of the current slice only, and
+        whole decks are not cached (per-chunk questions still are).
+
+        Args:
+            pages (iterable): Raw page texts, e.g. from utils.iter_pdf_pages or utils.iter_text_blocks.
+            remove_headers (bool): Remove running headers, footers and page numbers, for real
+                                   pages such as those of utils.iter_pdf_pages. Leave off for
+                                   utils.iter_text_blocks.
+            Other arguments are the same as for `generate_qa_pairs`.
+
+        Yields:
+            dict: A Q&A dictionary with 'question', 'answer' and 'difficulty' keys.
+        """
+        run_stats = stats if stats is not None else (RunStats() if self.hooks else NULL_STATS)
+        try:
+            yield from _timed(self._iter_qa_pairs_from_pages(
+                pages, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length, chunk_overlap,
+                qg_batch_size, qa_batch_size, decoding or self.decoding, run_stats, remove_headers,
+            ), run_stats, "total")
+        finally:
+            self._notify_hooks(run_stats)
+
+
+    def _iter_qa_pairs_from_pages(self, pages, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length,
+                                  chunk_overlap, qg_batch_size, qa_batch_size, decoding, stats, remove_headers):
+        """Runs the pipeline behind `iter_qa_pairs_from_pages`, recording into `stats`."""
+        with tempfile.TemporaryFile("w+", encoding="utf-8") as spool:
+            chunks = _SpooledChunks(spool)
+            # Extraction and preprocessing happen lazily, so they are timed as part of chunking
+            with stats.stage("chunking"):
+                sentences = iter_sentences(iter_preprocessed(pages, remove_headers=remove_headers))
+                for chunk in iter_chunks(sentences, self._count_qg_tokens, self._qg_chunk_budget(max_qg_length),
+                                         chunk_overlap):
+                    chunks.append(chunk)
+            stats.count("chunks", len(chunks))
+            if not len(chunks):
+                print("Input text is too short for meaningful Q&A generation.")
+                return
+
+            run = self._new_deck_run(0, num_qa, chunks, decoding)
+            for _, new_pairs in self._iter_rounds([run], max_qg_length, max_qa_context_length, max_qa_answer_length,
+                                                  qg_batch_size, qa_batch_size, decoding, stats):
+                yield from new_pairs
+            self._finish_deck(run)
+
+
+    def generate_qa_pairs_batch(self, texts, num_qa=10, max_qg_length=512, max_qa_context_length=512,
+                                max_qa_answer_length=200, chunk_overlap=1, qg_batch_size=8, qa_batch_size=16, decoding=None,
+                                stats=None):
+        """
+        Generates question-answer pairs for several documents, batching QG across all of their chunks.
+
+        Args:
+            texts (list): The input documents.
+            num_qa (int or list): The desired number of Q&A pairs per document, either one value
+                                  for all documents or one value per document.
+            max_qg_length (int): Maximum token length for each chunk passed to the question generation model.
+            max_qa_context_length (int): Maximum token length for the context provided to the
+                                        question answering model.
+            max_qa_answer_length (int): Maximum token length for the generated answer from the
+                                        question answering model.
+            chunk_overlap (int): Number of sentences shared between consecutive chunks.
+            qg_batch_size (int): Maximum number of chunks passed to the QG model in one `generate` call.
+            qa_batch_size (int): Number of question/context pairs per QA forward pass.
+            decoding (str): The question generation decoding mode, one of DECODING_MODES.
+                            Defaults to the mode the generator was created with.
+            stats (RunStats): Optional RunStats to record per-stage timings and counters into,
+                              e.g. to show a breakdown of this run. The generator's hooks
+                              receive it too.
+
+        Returns:
+            list: One list of Q&A dictionaries per input document, in input order.
+        """
+        run_stats = stats if stats is not None else (RunStats() if self.hooks else NULL_STATS)
+        try:
+            with run_stats.stage("total"):
+                return self._generate_qa_pairs_batch(
+                    texts, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length,
+                    chunk_overlap, qg_batch_size, qa_batch_size, decoding or self.decoding, run_stats,
+                )
+        finally:
+            self._notify_hooks(run_stats)
+
+
+    def _generate_qa_pairs_batch(self, texts, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length,
+                                 chunk_overlap, qg_batch_size, qa_batch_size, decoding, stats):
+        """Runs the pipeline behind `generate_qa_pairs_batch`, recording into `stats`."""
+        num_qas = list(num_qa) if isinstance(num_qa, (list, tuple)) else [num_qa] * len(texts)
+        results = [None] * len(texts)
+        runs = []
+        for doc_index, text in enumerate(texts):
+            results[doc_index], run = self._start_deck(doc_index, text, num_qas[doc_index], max_qg_length,
+                                                       max_qa_context_length, max_qa_answer_length, chunk_overlap,
+                                                       qg_batch_size, decoding, stats)
+            if run is not None:
+                runs.append(run)
+
+        for _ in self._iter_rounds(runs, max_qg_length, max_qa_context_length, max_qa_answer_length, qg_batch_size,
+                                   qa_batch_size, decoding, stats):
+            pass
+
+        for run in runs:
+            self._finish_deck(run)
+            results[run.doc_index] = run.qa_pairs
+        return results
+
+
+    def _new_deck_run(self, doc_index, num_qa, chunks, decoding, passage_index=None, deck_key=None):
+        """Sets up one document's deck in progress, with a fresh question budget and near-duplicate index."""
+        from budget import MAX_CANDIDATES_PER_CHUNK, QuestionBudget
+
+        budget = QuestionBudget(len(chunks), max_rounds=self.max_qg_rounds,
+                                max_candidates=1 if decoding == "greedy" else MAX_CANDIDATES_PER_CHUNK)
+        return _DeckRun(doc_index, num_qa, chunks, budget, self._new_near_duplicate_index(), passage_index, deck_key)
+
+
+    def _start_deck(self, doc_index, text, num_qa, max_qg_length, max_qa_context_length, max_qa_answer_length,
+                    chunk_overlap, qg_batch_size, decoding, stats):
+        """
+        Looks up one document's deck in the cache, and otherwise chunks the document for `_iter_rounds`.
+
+        Returns:
+            tuple: (deck, None) for a cached deck or a document too short to use, or (None, _DeckRun)
+                   for a deck still to be generated.
+        """
         if not text or len(text.strip()) < 50: 
             print("Input text is too short for meaningful Q&A generation.")
-            return qa_pairs
-
-       
-        input_text_for_qg = "generate question: " + text
-        
-
-        # Tokenize the input for QG, ensuring truncation if too long
-        inputs = self.qg_tokenizer(
-            input_text_for_qg,
-            max_length=max_qg_length,
-            truncation=True,
-            return_tensors="pt"
-        ).to(self.device) 
-
-       
-        dynamic_num_beams = max(10, num_qa * 2) 
-        num_sequences_to_return = dynamic_num_beams
-
-
-        # Generate questions using beam search for better quality and diversity
-        generated_ids = self.qg_model.generate(
-            inputs["input_ids"],
-            num_beams=dynamic_num_beams, 
-            max_length=64, 
-            early_stopping=True, 
-            num_return_sequences=num_sequences_to_return, 
-            length_penalty=0.8, 
-            no_repeat_ngram_size=2 
-        )
+            return [], None
 
-        
-        questions = [self.qg_tokenizer.decode(g, skip_special_tokens=True).strip() for g in generated_ids]
-        
+        deck_key = None
+        if self.cache is not None:
+            deck_key = self._deck_cache_key(text, num_qa, max_qg_length, max_qa_context_length,
+                                            max_qa_answer_length, chunk_overlap, qg_batch_size, decoding)
+            with stats.stage("cache_lookup"):
+                cached_pairs = self.cache.get(deck_key)
+            if cached_pairs is not None:
+                stats.count("deck_cache_hits")
+                return cached_pairs, None
 
-        # Filter for unique and non-empty questions
-        unique_questions = []
-        seen_questions = set()
-        for q in questions:
-            cleaned_q = ' '.join(q.replace('\n', ' ').split())
-            normalized_q_for_check = re.sub(r'[^\w\s]', '', cleaned_q).lower().strip()
-
-            if cleaned_q and normalized_q_for_check not in seen_questions and "?" in cleaned_q: 
-                unique_questions.append(cleaned_q)
-                seen_questions.add(normalized_q_for_check) 
-                if len(unique_questions) >= num_qa:
-                    break
+        with stats.stage("chunking"):
+            chunks = self.chunk_text(text, max_qg_length=max_qg_length, chunk_overlap=chunk_overlap)
+        stats.count("chunks", len(chunks))
+        if not chunks:
+            return [], None
+        return None, self._new_deck_run(doc_index, num_qa, chunks, decoding,
+                                        self._build_passage_index(text, max_qa_context_length, stats), deck_key)
 
 
-        # If not enough unique questions are generated, try generating more or adjust parameters
-        if len(unique_questions) < num_qa and num_qa > 0:
-            print(f"Warning: Only {len(unique_questions)} unique questions generated, targeting {num_qa}. "
-                  f"Consider increasing input text length, adjusting parameters (e.g., max num_beams), or "
-                  f"providing more diverse input content.")
+    def _finish_deck(self, run):
+        """Warns about a deck that fell short of its target and caches it."""
+        if run.need > 0:
+            print(f"Warning: Only {len(run.qa_pairs)} flashcards generated, targeting {run.num_qa}. "
+                  f"Consider increasing input text length, max_qg_rounds, or providing more diverse input content.")
+        if run.deck_key is not None:
+            self.cache.set(run.deck_key, run.qa_pairs)
 
 
-        # Generate answers for each unique question using the QA pipeline
-        for question in unique_questions:
-            try:
-                answer_result = self.qa_pipeline(
-                    question=question,
-                    context=text,
-                    max_answer_len=max_qa_answer_length,
-                    handle_impossible_answer=True, 
-                )
-                answer = answer_result['answer'].strip()
-                cleaned_answer = ' '.join(answer.replace('\n', ' ').split())
+    def _iter_rounds(self, runs, max_qg_length, max_qa_context_length, max_qa_answer_length, qg_batch_size,
+                     qa_batch_size, decoding, stats):
+        """
+        Generates the decks of several documents in rounds planned by each one's QuestionBudget.
 
-                if cleaned_answer and cleaned_answer.lower() not in ["no answer", ""] and len(cleaned_answer) > 3 and cleaned_answer.lower() != question.lower():
-                    qa_pairs.append({"question": question, "answer": cleaned_answer})
-                    if len(qa_pairs) >= num_qa: 
-                        break
-            except Exception as e:
-                print(f"Error generating answer for question '{question}': {e}")
-                continue
-        
-        return qa_pairs
\ No newline at end of file
+        Each round first selects, for every document, candidates left over from earlier rounds,
+        which cost no generation, then plans QG for the cards still missing. The plan is run in
+        slices of `qg_batch_size` chunks, in document order; each step runs one slice of every
+        document in one batched QG call and one batched QA call, and answers only as many
+        questions as the slice's share of the round. A document's deck therefore depends only on
+        its own slices, not on the documents it is batched with, and the first cards of a
+        streamed document arrive after one small QG batch.
+
+        Args:
+            runs (list): The _DeckRun of each document; their `qa_pairs` receive the new cards.
+            Other arguments are the same as for `generate_qa_pairs`.
+
+        Yields:
+            tuple: (_DeckRun, list of new Q&A dictionaries), for each document after each step.
+        """
+        active = [run for run in runs if run.need > 0]
+        while active:
+            planned = False
+            for run in active:
+                run.leftovers = self._select_run_questions(run, run.need, stats)
+                plan = run.budget.plan(run.need - len(run.leftovers))
+                planned = planned or bool(plan)
+                run.slices = deque(plan[start:start + qg_batch_size] for start in range(0, len(plan), qg_batch_size))
+                if run.leftovers and not run.slices:
+                    run.slices.append([])
+                run.target = len(run.qa_pairs)
+            if planned:
+                stats.count("qg_rounds")
+            # A document with nothing left to try is finished
+            active = [run for run in active if run.slices]
+
+            stepping = active
+            while stepping:
+                requests = [(run, chunk_index, num_candidates)
+                            for run in stepping for chunk_index, _, num_candidates in run.slices[0]]
+                generated = self._generate_questions([run.chunks[i] for run, i, _ in requests],
+                                                     [n for _, _, n in requests], max_qg_length, qg_batch_size,
+                                                     decoding, stats=stats) if requests else []
+                for run in stepping:
+                    run.slice_candidates = 0
+                for (run, chunk_index, _), questions in zip(requests, generated):
+                    run.slice_candidates += self._store_candidates(run, chunk_index, questions)
+
+                selected = []
+                for run in stepping:
+                    round_slice = run.slices.popleft()
+                    unique_questions, run.leftovers = run.leftovers, []
+                    run.target += len(unique_questions) + sum(quota for _, quota, _ in round_slice)
+                    wanted = min(run.need, run.target - len(run.qa_pairs)) - len(unique_questions)
+                    if round_slice and wanted > 0:
+                        unique_questions = unique_questions + self._select_run_questions(run, wanted, stats)
+                    selected.append(unique_questions)
+
+                # Answer every selected question of every document in one batched QA call,
+                # each against its best passages of its own document
+                qa_inputs, counts = [], []
+                for run, unique_questions in zip(stepping, selected):
+                    passage_index = run.passage_index
+                    if passage_index is None and unique_questions:
+                        passage_index = self._build_passage_index(
+                            "\n".join(run.chunks[i] for i in sorted({i for _, i in unique_questions})),
+                            max_qa_context_length, stats)
+                    run_inputs, run_counts = self._qa_inputs(unique_questions, run.chunks, passage_index, stats)
+                    qa_inputs.extend(run_inputs)
+                    counts.extend(run_counts)
+                answer_results = self._best_answers(
+                    qa_inputs, self._run_qa(qa_inputs, max_qa_answer_length, qa_batch_size, stats=stats), counts)
+
+                offset = 0
+                for run, unique_questions in zip(stepping, selected):
+                    run_answers = answer_results[offset:offset + len(unique_questions)]
+                    offset += len(unique_questions)
+                    new_pairs = self._collect_qa_pairs(unique_questions, run_answers, run.need, stats)
+                    run.qa_pairs.extend(new_pairs)
+                    run.budget.yield_estimate.record(run.slice_candidates, len(new_pairs))
+                    if run.need <= 0:
+                        run.slices.clear()
+                    yield run, new_pairs
+                stepping = [run for run in stepping if run.slices]
+
+            active = [run for run in active if run.need > 0]
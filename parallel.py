@@ -0,0 +1,249 @@
+"""
+Runs flashcard generation across several worker processes, each with its own QAGenerator.
+
+One QAGenerator runs its work on a single torch intra-op pool, which stops scaling well
+beyond a handful of cores. ParallelQAGenerator instead runs N workers with a few threads
+each, and either spreads documents across them (`iter_batch`, for bulk deck generation)
+or splits one large document into contiguous shards (`generate_document`). Results always
+come back in input order, and questions repeated across shards of a document are dropped
+when the shards are merged.
+
+Usage:
+    with ParallelQAGenerator(num_workers=8, threads_per_worker=4) as generator:
+        for index, qa_pairs in generator.iter_batch(texts, num_qa=20):
+            ...
+"""
+import math
+import multiprocessing
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from llm_model import QAGenerator
+from utils import split_into_sentences
+
+
+# The worker process's generator; inherited from the parent when weights are shared via fork
+_worker_generator = None
+
+
+def _init_worker(generator_kwargs, threads_per_worker):
+    global _worker_generator
+    if _worker_generator is None:
+        _worker_generator = QAGenerator(**dict(generator_kwargs, num_threads=threads_per_worker))
+    elif threads_per_worker:
+        import torch
+
+        torch.set_num_threads(threads_per_worker)
+
+
+def _generate_batch_task(texts, num_qas, options):
+    return _worker_generator.generate_qa_pairs_batch(texts, num_qa=num_qas, **options)
+
+
+def _generate_shard_task(text, num_qa, options):
+    return _worker_generator.generate_qa_pairs(text, num_qa=num_qa, **options)
+
+
+class ParallelQAGenerator:
+    def __init__(self, num_workers=None, threads_per_worker=4, share_weights=False, shard_headroom=0.25,
+                 **generator_kwargs):
+        """
+        Configures a pool of generation workers. The workers start on first use.
+
+        Args:
+            num_workers (int): Number of worker processes. Defaults to the number of cores
+                               divided by `threads_per_worker`.
+            threads_per_worker (int): Torch intra-op threads per worker. Workers times threads
+                                      should not exceed the number of physical cores.
+            share_weights (bool): Load the models once in this process and fork the workers from it,
+                                  so they share the weights copy-on-write instead of each loading a
+                                  copy. Only available where fork is (Linux, macOS), and only safe
+                                  before this process has run any inference itself.
+            shard_headroom (float): Extra share of questions each shard of a document is asked for,
+                                    to make up for questions dropped as duplicates across shards.
+            **generator_kwargs: Arguments for each worker's QAGenerator, e.g. `qg_backend` or `cache`.
+                                Hooks run inside the workers.
+        """
+        self.threads_per_worker = threads_per_worker
+        self.num_workers = num_workers or max(1, (os.cpu_count() or 1) // max(1, threads_per_worker or 1))
+        self.share_weights = share_weights
+        self.shard_headroom = shard_headroom
+        self.generator_kwargs = generator_kwargs
+
+        # Used in this process only to merge shards, which needs no model
+        self.qa_generator = QAGenerator(**generator_kwargs)
+        self._executor = None
+
+
+    def __enter__(self):
+        self.start()
+        return self
+
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+
+    def start(self):
+        """
+        Starts the worker pool, if it is not running yet.
+        """
+        if self._executor is not None:
+            return
+        global _worker_generator
+        if self.share_weights:
+            self.qa_generator.warm_up(run_inference=False)
+            _worker_generator = self.qa_generator
+            context = multiprocessing.get_context("fork")
+        else:
+            # A fresh interpreter per worker, so no torch thread pool state is inherited
+            context = multiprocessing.get_context("spawn")
+        self._executor = ProcessPoolExecutor(max_workers=self.num_workers, mp_context=context,
+                                             initializer=_init_worker,
+                                             initargs=(self.generator_kwargs, self.threads_per_worker))
+
+
+    def close(self):
+        """
+        Stops the worker pool.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+    def iter_batch(self, texts, num_qa=10, docs_per_task=1, **options):
+        """
+        Generates decks for many documents across the workers, yielding them in input order.
+
+        Documents are sent to the workers in tasks of `docs_per_task`, so each worker still
+        batches QG and QA across the documents of a task. At most two tasks per worker are
+        queued at a time, so `texts` may be a generator that loads documents lazily.
+
+        Args:
+            texts (iterable): The preprocessed input documents.
+            num_qa (int or list): The desired number of Q&A pairs per document, either one value
+                                  for all documents or one value per document.
+            docs_per_task (int): Number of documents each worker processes as one batch.
+            **options: Further arguments for `QAGenerator.generate_qa_pairs_batch`, e.g. `decoding`.
+
+        Yields:
+            tuple: (document index, list of Q&A dictionaries), in input order.
+        """
+        self.start()
+        num_qas = num_qa if isinstance(num_qa, (list, tuple)) else None
+        in_flight, index = deque(), 0
+
+        def submit(batch):
+            in_flight.append(self._executor.submit(_generate_batch_task, [text for text, _ in batch],
+                                                   [n for _, n in batch], options))
+
+        batch = []
+        for doc_index, text in enumerate(texts):
+            batch.append((text, num_qas[doc_index] if num_qas is not None else num_qa))
+            if len(batch) < docs_per_task:
+                continue
+            submit(batch)
+            batch = []
+            # Wait for the oldest task first, so results come out in order
+            while len(in_flight) >= 2 * self.num_workers:
+                for qa_pairs in in_flight.popleft().result():
+                    yield index, qa_pairs
+                    index += 1
+        if batch:
+            submit(batch)
+        while in_flight:
+            for qa_pairs in in_flight.popleft().result():
+                yield index, qa_pairs
+                index += 1
+
+
+    def generate_batch(self, texts, num_qa=10, docs_per_task=1, **options):
+        """
+        Generates decks for many documents across the workers.
+
+        Takes the same arguments as `iter_batch`.
+
+        Returns:
+            list: One list of Q&A dictionaries per input document, in input order.
+        """
+        return [qa_pairs for _, qa_pairs in self.iter_batch(texts, num_qa, docs_per_task, **options)]
+
+
+    def generate_document(self, text, num_qa=10, **options):
+        """
+        Generates one deck for a large document by splitting it into one contiguous shard per worker.
+
+        Each shard is asked for its share of `num_qa`, plus `shard_headroom`. The shards' decks are
+        merged in document order, dropping questions that repeat (exactly or, with the generator's
+        near-duplicate filter, approximately) a question from an earlier shard.
+
+        Args:
+            text (str): The preprocessed input text.
+            num_qa (int): The desired number of Q&A pairs.
+            **options: Further arguments for `QAGenerator.generate_qa_pairs`, e.g. `decoding`.
+
+        Returns:
+            list: Q&A dictionaries, in document order.
+        """
+        sentences = split_into_sentences(text)
+        if not sentences or num_qa <= 0:
+            return []
+        self.start()
+
+        # Contiguous shards of roughly equal length, so each worker gets a similar amount of work
+        num_shards = min(self.num_workers, num_qa, len(sentences))
+        total_chars, shards, shard, shard_chars = sum(len(s) for s in sentences), [], [], 0
+        for sentence in sentences:
+            shard.append(sentence)
+            shard_chars += len(sentence)
+            if len(shards) < num_shards - 1 and shard_chars >= total_chars * (len(shards) + 1) / num_shards:
+                shards.append("\n".join(shard))
+                shard = []
+        if shard:
+            shards.append("\n".join(shard))
+
+        quotas = self.qa_generator._allocate_questions(num_qa, len(shards))
+        futures = [self._executor.submit(_generate_shard_task, shard_text,
+                                         quota + math.ceil(quota * self.shard_headroom), options)
+                   for shard_text, quota in zip(shards, quotas)]
+        return self._merge_shards([future.result() for future in futures], quotas, num_qa)
+
+
+    def _merge_shards(self, shard_decks, quotas, num_qa):
+        """
+        Merges the decks of a document's shards, in document order and without cross-shard duplicates.
+
+        Each shard first contributes up to its quota; shards that fell short are then made up
+        for with the other shards' extra cards, earliest shards first.
+
+        Args:
+            shard_decks (list): Each shard's Q&A dictionaries, in document order.
+            quotas (list): Each shard's share of `num_qa`.
+            num_qa (int): The desired number of Q&A pairs.
+
+        Returns:
+            list: Up to `num_qa` Q&A dictionaries.
+        """
+        seen_questions = set()
+        near_duplicates = self.qa_generator._new_near_duplicate_index()
+        unique_decks = []
+        for qa_pairs in shard_decks:
+            unique = []
+            for qa in qa_pairs:
+                normalized = re.sub(r'[^\w\s]', '', qa["question"]).lower().strip()
+                if normalized not in seen_questions:
+                    seen_questions.add(normalized)
+                    unique.append(qa)
+            if near_duplicates is not None and unique:
+                unique = [qa for qa, accepted in zip(unique, near_duplicates.add([qa["question"] for qa in unique]))
+                          if accepted]
+            unique_decks.append(unique)
+
+        counts = [min(quota, len(unique)) for quota, unique in zip(quotas, unique_decks)]
+        for i, unique in enumerate(unique_decks):
+            counts[i] += max(0, min(len(unique) - counts[i], num_qa - sum(counts)))
+        return [qa for unique, count in zip(unique_decks, counts) for qa in unique[:count]]
@@ -0,0 +1,123 @@
+import re
+from collections import Counter, deque
+
+
+# Digits are masked so that "Chapter 3 - page 12" and "Chapter 3 - page 13" count as the same header,
+# and bare page numbers ("12", "13", ...) as the same footer
+_DIGITS = re.compile(r"\d+")
+
+
+class TextPreprocessor:
+    def __init__(self, dehyphenate=True, remove_headers=True, edge_lines=2, min_repeats=3, lookahead=3):
+        """
+        Cleans extracted text in one pass over its lines, one page (or chunk) at a time.
+
+        Each line is trimmed and its runs of whitespace collapsed to single spaces, blank lines
+        are dropped, and words hyphenated across a line break ("photo-" / "synthesis") are
+        joined again. Across pages, lines at the top or bottom of a page that repeat on several
+        pages, ignoring digits, are running headers, footers or page numbers and are removed.
+
+        Args:
+            dehyphenate (bool): Join words split by a hyphen at the end of a line.
+            remove_headers (bool): Remove repeated headers, footers and page numbers.
+            edge_lines (int): Number of lines at the top and at the bottom of each page that can be
+                              a header or footer.
+            min_repeats (int): Number of pages an edge line must appear on to count as a header or footer.
+            lookahead (int): Number of pages buffered ahead of the page being cleaned, so headers are
+                             recognized from the first page on.
+        """
+        self.dehyphenate = dehyphenate
+        self.remove_headers = remove_headers
+        self.edge_lines = edge_lines
+        self.min_repeats = min_repeats
+        self.lookahead = lookahead
+
+
+    def clean_lines(self, text):
+        """
+        Trims, collapses whitespace in and de-hyphenates the lines of one page or chunk.
+
+        Args:
+            text (str): The raw text.
+
+        Returns:
+            list: The non-empty cleaned lines.
+        """
+        lines = []
+        for raw_line in text.splitlines():
+            # split/join collapses every kind of whitespace run, and trims, in a single C-level pass
+            line = " ".join(raw_line.split())
+            if not line:
+                continue
+            if (self.dehyphenate and lines and line[0].islower() and lines[-1].endswith("-")
+                    and lines[-1][-2:-1].isalpha()):
+                lines[-1] = lines[-1][:-1] + line
+            else:
+                lines.append(line)
+        return lines
+
+
+    def clean(self, text):
+        """
+        Cleans one page or chunk, without header and footer removal.
+
+        Args:
+            text (str): The raw text.
+
+        Returns:
+            str: The cleaned text, one line per line of input.
+        """
+        return "\n".join(self.clean_lines(text))
+
+
+    def iter_pages(self, pages):
+        """
+        Cleans a stream of pages, removing running headers, footers and page numbers.
+
+        At most `lookahead` + 1 pages are held in memory at a time.
+
+        Args:
+            pages (iterable): Raw page texts, in document order.
+
+        Yields:
+            str: Each cleaned page that still has text, in document order.
+        """
+        edge_counts = Counter()
+        pending = deque()
+        for page in pages:
+            lines = self.clean_lines(page)
+            if self.remove_headers:
+                edge_counts.update(self._edge_signatures(lines))
+            pending.append(lines)
+            if len(pending) > self.lookahead:
+                text = self._finish_page(pending.popleft(), edge_counts)
+                if text:
+                    yield text
+        while pending:
+            text = self._finish_page(pending.popleft(), edge_counts)
+            if text:
+                yield text
+
+
+    def _edge_signatures(self, lines):
+        """The digit-masked signatures of a page's candidate header and footer lines, once each."""
+        if len(lines) <= 2 * self.edge_lines:
+            edges = lines
+        else:
+            edges = lines[:self.edge_lines] + lines[-self.edge_lines:]
+        return {_DIGITS.sub("#", line.lower()) for line in edges}
+
+
+    def _finish_page(self, lines, edge_counts):
+        if self.remove_headers and lines:
+            def is_furniture(line):
+                return edge_counts[_DIGITS.sub("#", line.lower())] >= self.min_repeats
+
+            # Only strip from the edges inwards, so body text that happens to repeat is kept
+            start, end = 0, len(lines)
+            while start < min(self.edge_lines, end) and is_furniture(lines[start]):
+                start += 1
+            while end > max(start, len(lines) - self.edge_lines) and is_furniture(lines[end - 1]):
+                end -= 1
+            lines = lines[start:end]
+        return "\n".join(lines)
@@ -0,0 +1,80 @@
+import re
+from collections import Counter
+
+import numpy as np
+
+from semantic_dedup import STOPWORDS
+
+
+def _terms(text):
+    """Lowercased word tokens of `text`, without stopwords."""
+    return [word for word in re.findall(r"\w+", text.lower()) if word not in STOPWORDS]
+
+
+class PassageIndex:
+    def __init__(self, passages, k1=1.5, b=0.75):
+        """
+        A BM25 index over a document's passages, built once and searched once per question.
+
+        Postings are stored as flat NumPy arrays sorted by term, with each posting's BM25
+        weight precomputed, so scoring a query is one `bincount` over the postings of its terms.
+
+        Args:
+            passages (list): The passage strings, in document order.
+            k1 (float): BM25 term-frequency saturation.
+            b (float): BM25 length normalization.
+        """
+        self.passages = list(passages)
+        self._vocabulary = {}
+
+        term_ids, passage_ids, counts = [], [], []
+        lengths = np.zeros(len(self.passages), dtype=np.float32)
+        for passage_id, passage in enumerate(self.passages):
+            terms = _terms(passage)
+            lengths[passage_id] = len(terms)
+            term_counts = Counter(self._vocabulary.setdefault(term, len(self._vocabulary)) for term in terms)
+            term_ids.extend(term_counts.keys())
+            passage_ids.extend([passage_id] * len(term_counts))
+            counts.extend(term_counts.values())
+
+        # Sort postings by term so each term's postings are one contiguous slice
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        term_ids = term_ids[order]
+        self._passage_ids = np.asarray(passage_ids, dtype=np.int64)[order]
+        counts = np.asarray(counts, dtype=np.float32)[order]
+
+        doc_freq = np.bincount(term_ids, minlength=len(self._vocabulary))
+        self._offsets = np.concatenate([[0], np.cumsum(doc_freq)])
+        idf = np.log1p((len(self.passages) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        length_norm = k1 * (1 - b + b * lengths / max(float(lengths.mean()), 1.0)) if len(lengths) else lengths
+        self._weights = idf[term_ids] * counts * (k1 + 1) / (counts + length_norm[self._passage_ids])
+
+
+    def __len__(self):
+        return len(self.passages)
+
+
+    def search(self, query, top_k=2):
+        """
+        Finds the passages that best match a query.
+
+        Args:
+            query (str): The query text, e.g. a generated question.
+            top_k (int): Maximum number of passages to return.
+
+        Returns:
+            list: Indices into `passages`, best first. Passages sharing no terms with the query are left out.
+        """
+        term_ids = {self._vocabulary[term] for term in _terms(query) if term in self._vocabulary}
+        if not term_ids or top_k <= 0:
+            return []
+
+        postings = np.concatenate([np.arange(self._offsets[t], self._offsets[t + 1]) for t in term_ids])
+        scores = np.bincount(self._passage_ids[postings], weights=self._weights[postings],
+                             minlength=len(self.passages))
+
+        k = min(top_k, len(self.passages))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [int(i) for i in top if scores[i] > 0]
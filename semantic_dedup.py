@@ -0,0 +1,173 @@
+import re
+import zlib
+
+import numpy as np
+
+
+# Function words that most questions share; they would make any two questions look alike
+STOPWORDS = frozenset("""
+a an the of in on at to for by with from as and or is are was were be been being do does did has have had
+that this these those it its there their
+""".split())
+
+# Question words decide what is asked ("When did X begin?" / "Why did X begin?"), so each is one
+# heavily weighted feature rather than a few n-grams that a long subject would outweigh
+INTERROGATIVES = frozenset("what which who whom whose when where why how".split())
+_INTERROGATIVE_WEIGHT = 4.0
+
+
+class HashingEmbedder:
+    def __init__(self, n_features=4096, ngram_sizes=(3, 4, 5)):
+        """
+        Embeds short texts as L2-normalized bags of hashed character n-grams.
+
+        Needs no model and costs microseconds per question, while still scoring paraphrases
+        that share most of their wording ("What is X?" / "What does X mean?") as similar.
+        Paraphrases in other words need a TransformerEmbedder.
+
+        Args:
+            n_features (int): Dimension of the hashed vectors.
+            ngram_sizes (tuple): Character n-gram lengths, taken within word boundaries.
+        """
+        self.n_features = n_features
+        self.ngram_sizes = ngram_sizes
+
+
+    def encode(self, texts):
+        """
+        Embeds a batch of texts.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Returns:
+            np.ndarray: A (len(texts), n_features) float32 array of unit-length rows.
+        """
+        vectors = np.zeros((len(texts), self.n_features), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"\w+", text.lower()):
+                if word in STOPWORDS:
+                    continue
+                if word in INTERROGATIVES:
+                    column = zlib.crc32(f"?{word}".encode("utf-8")) % self.n_features
+                    vectors[row, column] += _INTERROGATIVE_WEIGHT
+                    continue
+                padded = f" {word} "
+                for n in self.ngram_sizes:
+                    for start in range(max(1, len(padded) - n + 1)):
+                        # crc32 rather than hash(): Python's string hash is salted per process
+                        column = zlib.crc32(padded[start:start + n].encode("utf-8")) % self.n_features
+                        vectors[row, column] += 1.0
+        return _normalize(vectors)
+
+
+class TransformerEmbedder:
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", batch_size=64):
+        """
+        Embeds texts with a Hugging Face encoder and mean pooling, loaded on first use.
+
+        Catches paraphrases that share little wording, at the cost of one extra small model
+        and one batched forward pass per set of candidate questions.
+
+        Args:
+            model_name (str): The Hugging Face model ID of a sentence embedding model.
+            batch_size (int): Number of texts per forward pass.
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._tokenizer = None
+        self._model = None
+
+
+    def encode(self, texts):
+        """
+        Embeds a batch of texts.
+
+        Args:
+            texts (list): The texts to embed.
+
+        Returns:
+            np.ndarray: A (len(texts), hidden size) float32 array of unit-length rows.
+        """
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        if self._model is None:
+            self._tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            self._model = AutoModel.from_pretrained(self.model_name).eval()
+
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self._tokenizer(texts[start:start + self.batch_size], padding=True, truncation=True,
+                                     return_tensors="pt")
+            with torch.inference_mode():
+                hidden = self._model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            batches.append(((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)).numpy())
+        return _normalize(np.concatenate(batches).astype(np.float32))
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class NearDuplicateIndex:
+    def __init__(self, embedder, threshold=0.9):
+        """
+        Keeps the embeddings of accepted questions and rejects new ones that are too similar.
+
+        Accepted vectors live in one preallocated matrix that doubles in size when full, so
+        each check is a single matrix-vector product against everything accepted so far.
+
+        Args:
+            embedder: An object with an `encode(texts)` method returning unit-length rows.
+            threshold (float): Cosine similarity at or above which a question counts as a near-duplicate.
+        """
+        self.embedder = embedder
+        self.threshold = threshold
+        self._vectors = None
+        self._size = 0
+
+
+    def __len__(self):
+        return self._size
+
+
+    def add(self, texts, limit=None):
+        """
+        Accepts each text, in order, unless it is a near-duplicate of one accepted before it.
+
+        All texts are embedded in one batch. Stops checking once `limit` texts have been accepted.
+
+        Args:
+            texts (list): Candidate texts, best first.
+            limit (int): Maximum number of texts to accept in this call.
+
+        Returns:
+            list: For each text, True if accepted, False if rejected as a near-duplicate,
+                  or None if it was not checked because `limit` was reached.
+        """
+        decisions = [None] * len(texts)
+        if not texts:
+            return decisions
+
+        vectors = self.embedder.encode(texts)
+        if self._vectors is None:
+            self._vectors = np.empty((max(64, len(texts)), vectors.shape[1]), dtype=np.float32)
+
+        accepted = 0
+        for i, vector in enumerate(vectors):
+            if limit is not None and accepted >= limit:
+                break
+            if self._size and float(np.max(self._vectors[:self._size] @ vector)) >= self.threshold:
+                decisions[i] = False
+                continue
+
+            if self._size == len(self._vectors):
+                self._vectors = np.concatenate([self._vectors, np.empty_like(self._vectors)])
+            self._vectors[self._size] = vector
+            self._size += 1
+            accepted += 1
+            decisions[i] = True
+        return decisions
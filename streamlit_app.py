@@ -1,10 +1,14 @@
 import streamlit as st
 from utils import extract_text_from_pdf, read_text_file, preprocess_text
-from llm_model import QAGenerator
-import pandas as pd
+from llm_model import QAGenerator, DECODING_MODES
+from cache import FlashcardCache
+from instrumentation import RunStats
+from exporters import EXPORT_FORMATS, FILE_EXTENSIONS, MIME_TYPES, export_to_bytes
+from card_rendering import DECK_CSS, page_count, render_deck_html
 import base64
 import io
-import random 
+import os
+import threading
 
 
 #  Streamlit Configuration 
@@ -154,17 +158,32 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Palette and difficulty classes for the flashcards, so each card's markup stays small
+st.markdown(DECK_CSS, unsafe_allow_html=True)
+
+# Cards shown per page of the deck; the browser only ever holds one page of cards
+CARDS_PER_PAGE = 30
+
 # Model Loading 
 @st.cache_resource
 def get_qa_generator():
     """
     Initializes and returns the QAGenerator instance.
     This function is cached by Streamlit.
+    Generated decks are also cached on disk, so re-uploading the same document is instant.
+    The models load in a background thread, so the page renders while they warm up.
     """
-    return QAGenerator()
+    cache = FlashcardCache(os.environ.get("FLASHCARD_CACHE_DIR", ".flashcard_cache"))
+    generator = QAGenerator(cache=cache)
+    threading.Thread(target=generator.warm_up, daemon=True).start()
+    return generator
 
-# Get the cached QAGenerator instance
-qa_generator = get_qa_generator()
+# When FLASHCARD_SERVER_URL points at a running inference_server.py, generation is sent there,
+# so concurrent sessions share its batches instead of serializing on an in-process model.
+flashcard_server_url = os.environ.get("FLASHCARD_SERVER_URL")
+
+# Get the cached QAGenerator instance (cheap: models are loaded lazily)
+qa_generator = None if flashcard_server_url else get_qa_generator()
 
 
 #  Application Title and Description 
@@ -212,38 +231,51 @@ num_qa_pairs = st.slider(
     help="Adjust this slider to specify the approximate number of question-answer pairs you'd like to receive."
 )
 
-generate_button = st.button("3. Generate Flashcards ✨", type="primary", use_container_width=True)
+decoding_labels = {
+    "beam": "Beam search (best quality, slowest)",
+    "diverse_beam": "Diverse beam search (fewer duplicate questions)",
+    "sample": "Sampling (faster, more varied)",
+    "greedy": "Greedy (fastest, one question per section)",
+}
+decoding_mode = st.selectbox(
+    "Question generation strategy:",
+    DECODING_MODES,
+    index=0,
+    format_func=decoding_labels.get,
+    help="Beam search gives the best questions but its cost grows with the number of flashcards. "
+         "Sampling and greedy decoding are much faster, especially for large decks."
+)
 
-flashcards_container = st.empty()
+generate_button = st.button("3. Generate Flashcards ✨", type="primary", use_container_width=True)
 
 st.markdown("---")
 st.header("Generated Flashcards")
 
+flashcards_container = st.empty()
+
 if 'qa_pairs' not in st.session_state:
     st.session_state.qa_pairs = []
 
-#  list of attractive color palettes for flashcards
-flashcard_colors = [
-    {"background_start": "#5D4037", "background_end": "#4E342E", "border": "#3E2723", "question_text": "#FFCCBC", "answer_text": "#D7CCC8", "line_color": "#8D6E63"}, # Deep Brown
-    {"background_start": "#2E7D32", "background_end": "#1B5E20", "border": "#1B5E20", "question_text": "#C8E6C9", "answer_text": "#A5D6A7", "line_color": "#66BB6A"}, # Dark Green
-    {"background_start": "#1565C0", "background_end": "#0D47A1", "border": "#0D47A1", "question_text": "#BBDEFB", "answer_text": "#90CAF9", "line_color": "#42A5F5"}, # Deep Blue
-    {"background_start": "#EF6C00", "background_end": "#E65100", "border": "#E65100", "question_text": "#FFECB3", "answer_text": "#FFCC80", "line_color": "#FFA726"}, # Dark Orange
-    {"background_start": "#C2185B", "background_end": "#AD1457", "border": "#AD1457", "question_text": "#F8BBD0", "answer_text": "#F48FB1", "line_color": "#EC407A"}, # Deep Pink
-    {"background_start": "#6A1B9A", "background_end": "#4A148C", "border": "#4A148C", "question_text": "#E1BEE7", "answer_text": "#CE93D8", "line_color": "#AB47BC"}, # Deep Purple
-    {"background_start": "#558B2F", "background_end": "#33691E", "border": "#33691E", "question_text": "#DCEDC8", "answer_text": "#C5E1A5", "line_color": "#9CCC65"}, # Dark Olive Green
-    {"background_start": "#FBC02D", "background_end": "#F9A825", "border": "#F9A825", "question_text": "#FFFDE7", "answer_text": "#FFF59D", "line_color": "#FFEB3B"}, # Dark Yellow
-]
-
-# difficulty levels 
-difficulty_colors = {
-    "Easy": "white",
-    "Medium": "yellow",
-    "Hard": "black"
-}
+
+def deck_cards(qa_pairs):
+    """The deck as hashable (question, answer, difficulty) tuples, the cache key of its rendered pages."""
+    return tuple((qa['question'], qa['answer'], qa['difficulty']) for qa in qa_pairs)
+
+
+@st.cache_data(max_entries=64)
+def render_deck_page(cards, page):
+    """Renders one page of the deck as a single HTML block, cached so reruns do not rebuild it."""
+    start = page * CARDS_PER_PAGE
+    return render_deck_html(cards[start:start + CARDS_PER_PAGE], start)
 
 
-def get_simulated_difficulty(question):
-    return random.choice(["Easy", "Medium", "Hard"])
+@st.cache_data(max_entries=16)
+def export_deck_bytes(cards, export_format):
+    """Exports the deck in one format, cached so reruns such as page changes do not rebuild the file."""
+    qa_pairs = [{"question": question, "answer": answer, "difficulty": difficulty}
+                for question, answer, difficulty in cards]
+    export_options = {"deck_name": "Flashcards"} if export_format == "apkg" else {}
+    return export_to_bytes(qa_pairs, export_format, **export_options)
 
 
 if generate_button:
@@ -273,16 +305,29 @@ if generate_button:
                 st.session_state.qa_pairs = []
             else:
                 try:
-                    raw_qa_pairs = qa_generator.generate_qa_pairs(preprocessed_text, num_qa=num_qa_pairs)
-                    
+                    run_stats = None
+                    if flashcard_server_url:
+                        # Imported here so the app does not pay for the client module when it is not used
+                        from inference_server import request_flashcards
+
+                        qa_stream = request_flashcards(flashcard_server_url, preprocessed_text, num_qa=num_qa_pairs, decoding=decoding_mode)
+                    else:
+                        # Cards are rendered one by one as soon as each answer is ready
+                        run_stats = RunStats()
+                        qa_stream = qa_generator.iter_qa_pairs(preprocessed_text, num_qa=num_qa_pairs, decoding=decoding_mode, stats=run_stats)
+
                     st.session_state.qa_pairs = []
-                    for qa in raw_qa_pairs:
-                        difficulty = get_simulated_difficulty(qa['question'])
+                    st.session_state.deck_page = 1
+                    for qa in qa_stream:
                         st.session_state.qa_pairs.append({
                             "question": qa['question'],
                             "answer": qa['answer'],
-                            "difficulty": difficulty
+                            "difficulty": qa['difficulty']
                         })
+                        # Only the first page is shown while generating, so each update stays small
+                        if len(st.session_state.qa_pairs) <= CARDS_PER_PAGE:
+                            flashcards_container.markdown(
+                                render_deck_html(deck_cards(st.session_state.qa_pairs)), unsafe_allow_html=True)
                     
                     if st.session_state.qa_pairs:
                         st.info("""
@@ -290,29 +335,17 @@ if generate_button:
                             - ⚪ **White Strip:** Easy Question
                             - 🟡 **Yellow Strip:** Medium Question
                             - ⚫ **Black Strip:** Hard Question
-                            (Difficulty is currently simulated for demonstration purposes.)
+                            (Difficulty is estimated from the answer model's confidence, the answer's length,
+                            how closely the question follows the text and how many long words it uses.)
                         """)
 
                         st.subheader(f"Generated {len(st.session_state.qa_pairs)} Flashcards:")
-
-                        with flashcards_container.container():
-                            st.markdown('<div class="flashcard-container">', unsafe_allow_html=True)
-
-                            for i, qa in enumerate(st.session_state.qa_pairs):
-                                color_palette = flashcard_colors[i % len(flashcard_colors)]
-                                difficulty_strip_color = difficulty_colors[qa['difficulty']]
-                                
-                                text_color_on_strip = "black" if qa['difficulty'] == "Easy" or qa['difficulty'] == "Medium" else "white"
-
-                                st.markdown(f"""
-                                <div class="flashcard" style="background: linear-gradient(135deg, {color_palette['background_start']} 0%, {color_palette['background_end']} 100%); border-color: {color_palette['border']};">
-                                    <div class="difficulty-strip" style="background-color: {difficulty_strip_color}; color: {text_color_on_strip};">{qa['difficulty'].upper()}</div>
-                                    <div class="flashcard-question" style="color: {color_palette['question_text']};">Q{i+1}: {qa['question']}</div>
-                                    <div class="flashcard-answer" style="color: {color_palette['answer_text']}; border-top-color: {color_palette['line_color']};">A{i+1}: {qa['answer']}</div>
-                                </div>
-                                """, unsafe_allow_html=True)
-                            st.markdown('</div>', unsafe_allow_html=True)
                         st.success("🎉 Flashcards generated successfully! Scroll down to view them.")
+
+                        if run_stats is not None:
+                            with st.expander("⏱️ Generation breakdown"):
+                                st.table({stage: f"{seconds * 1000:.0f} ms" for stage, seconds in run_stats.timings.items()})
+                                st.table({name: str(value) for name, value in sorted(run_stats.counters.items())})
                     else:
                         st.warning("🧐 No flashcards could be generated from the provided content. This might happen with very short, ambiguous, or highly specialized text. Please try with different content or a larger input.")
                         st.session_state.qa_pairs = [] 
@@ -325,22 +358,45 @@ if generate_button:
         st.session_state.qa_pairs = [] 
 
 
+# The deck is shown from the session state, so it survives reruns caused by other widgets
+if st.session_state.qa_pairs:
+    cards = deck_cards(st.session_state.qa_pairs)
+    with flashcards_container.container():
+        num_pages = page_count(len(cards), CARDS_PER_PAGE)
+        page = 1
+        if num_pages > 1:
+            page = st.number_input(f"Page (of {num_pages}):", min_value=1, max_value=num_pages, step=1, key="deck_page")
+        st.markdown(render_deck_page(cards, page - 1), unsafe_allow_html=True)
+
+
 # --- Export Section ---
 st.markdown("---")
 st.header("Export Options")
 
 if st.session_state.qa_pairs:
-   
-    df_export = pd.DataFrame([{'question': qa['question'], 'answer': qa['answer'], 'difficulty': qa['difficulty']} for qa in st.session_state.qa_pairs])
-    
-    csv_string = df_export.to_csv(index=False).encode('utf-8')
-    
+
+    export_labels = {
+        "csv": "CSV",
+        "jsonl": "JSON Lines",
+        "anki_tsv": "Anki (text import)",
+        "apkg": "Anki package (.apkg)",
+        "parquet": "Parquet",
+    }
+    export_format = st.selectbox(
+        "Export format:",
+        EXPORT_FORMATS,
+        index=0,
+        format_func=export_labels.get,
+        help="CSV and JSON Lines work with spreadsheets and scripts; both Anki formats can be imported "
+             "into Anki directly; Parquet suits data analysis tools."
+    )
+
     st.download_button(
-        label="Download Flashcards as CSV ⬇️",
-        data=csv_string,
-        file_name="flashcards.csv",
-        mime="text/csv",
-        help="Click to download your generated flashcards as a CSV file, including difficulty levels.",
+        label=f"Download Flashcards as {export_labels[export_format]} ⬇️",
+        data=export_deck_bytes(deck_cards(st.session_state.qa_pairs), export_format),
+        file_name=f"flashcards.{FILE_EXTENSIONS[export_format]}",
+        mime=MIME_TYPES[export_format],
+        help="Click to download your generated flashcards, including difficulty levels.",
         use_container_width=True
     )
 else:
@@ -1,28 +1,101 @@
 import PyPDF2
 import io
 import re
+from concurrent.futures import ProcessPoolExecutor
 
+from preprocessing import TextPreprocessor
 
-def extract_text_from_pdf(pdf_file):
+
+_worker_pdf_reader = None
+
+# A run of whitespace after terminal punctuation, or a run of line breaks
+_SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def _init_pdf_worker(pdf_bytes):
+    """Opens the PDF once per pool worker, so tasks only need to carry a page number."""
+    global _worker_pdf_reader
+    _worker_pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+
+
+def _extract_worker_page(page_num):
+    return _worker_pdf_reader.pages[page_num].extract_text() or ""
+
+
+def iter_pdf_pages(pdf_file, workers=None):
+    """
+    Yields the text of each page of a PDF, in page order, as soon as it is extracted.
+
+    Each page is parsed exactly once. With `workers` > 1, pages are fanned out across a
+    process pool; results are still yielded in page order, so preprocessing and chunking of
+    early pages overlap with the parsing of later ones. Question generation does not: it
+    starts once every page has been chunked (see `QAGenerator.iter_qa_pairs_from_pages`).
+
+    Args:
+        pdf_file: A binary file object, e.g. an upload from st.file_uploader or an open file.
+        workers (int): Number of worker processes. None or 1 extracts in this process.
+
+    Yields:
+        str: The text of one page, or an empty string for pages without text.
+    """
+    if not workers or workers <= 1:
+        for page in PyPDF2.PdfReader(pdf_file).pages:
+            yield page.extract_text() or ""
+        return
+
+    pdf_bytes = pdf_file.read()
+    num_pages = len(PyPDF2.PdfReader(io.BytesIO(pdf_bytes)).pages)
+    if num_pages == 0:
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, num_pages), initializer=_init_pdf_worker,
+                             initargs=(pdf_bytes,)) as executor:
+        yield from executor.map(_extract_worker_page, range(num_pages))
+
+
+def extract_text_from_pdf(pdf_file, workers=None):
     """
     Extracts text from an uploaded PDF file.
 
     Args:
         pdf_file: An uploaded file object from Streamlit (st.file_uploader).
+        workers (int): Number of worker processes to extract pages with. None extracts in this process.
 
     Returns:
         str: The extracted text from the PDF, or None if an error occurs.
     """
-    text = ""
     try:
-        pdf_reader = PyPDF2.PdfReader(io.BytesIO(pdf_file.read()))
-        for page_num in range(len(pdf_reader.pages)):
-            page = pdf_reader.pages[page_num]
-            text += page.extract_text() if page.extract_text() else ""
+        # Form feeds mark the page breaks, so preprocessing can recognize running headers and footers
+        return "\f".join(iter_pdf_pages(pdf_file, workers=workers))
     except Exception as e:
         print(f"Error extracting text from PDF: {e}")
         return None
-    return text
+
+
+def iter_text_blocks(text_file, block_chars=1 << 20):
+    """
+    Yields the text of a plain text file in blocks of whole lines, without reading it all at once.
+
+    Args:
+        text_file: A binary file object, e.g. an upload from st.file_uploader or an open file.
+        block_chars (int): Approximate number of characters per block.
+
+    Yields:
+        str: Consecutive blocks of the file, each ending at a line break (except possibly the last).
+    """
+    reader = io.TextIOWrapper(text_file, encoding="utf-8")
+    try:
+        block, size = [], 0
+        for line in reader:
+            block.append(line)
+            size += len(line)
+            if size >= block_chars:
+                yield "".join(block)
+                block, size = [], 0
+        if block:
+            yield "".join(block)
+    finally:
+        # Leave the caller's file open
+        reader.detach()
 
 
 def read_text_file(text_file):
@@ -45,7 +118,9 @@ def read_text_file(text_file):
 def preprocess_text(text):
     """
     Performs basic text preprocessing to clean the input for LLMs.
-    - Removes extra whitespace, ensures consistent line breaks.
+    - Removes extra whitespace and blank lines, and trims every line.
+    - Rejoins words hyphenated across line breaks.
+    - Removes running headers, footers and page numbers of extracted PDFs (pages separated by form feeds).
     - This helps in providing cleaner input to the models.
 
     Args:
@@ -56,16 +131,112 @@ def preprocess_text(text):
     """
     if text is None:
         return ""
-    
+    return "\n".join(iter_preprocessed(text.split("\f"), remove_headers=True))
+
+
+def iter_preprocessed(pages, remove_headers=False):
+    """
+    Preprocesses a document one page (or block) at a time.
+
+    Page boundaries are treated as line breaks, and pages left empty are skipped. With
+    `remove_headers`, only a few pages are buffered at a time, to recognize running headers
+    and footers.
+
+    Args:
+        pages (iterable): Raw page texts, e.g. from `iter_pdf_pages` or `iter_text_blocks`.
+        remove_headers (bool): Remove running headers, footers and page numbers. Only for real
+                               pages, e.g. from `iter_pdf_pages`: the edges of `iter_text_blocks`
+                               blocks are ordinary lines of text.
+
+    Yields:
+        str: The preprocessed text of each non-empty page.
+    """
+    return TextPreprocessor(remove_headers=remove_headers).iter_pages(pages)
+
+
+def split_into_sentences(text):
+    """
+    Splits text into sentences on terminal punctuation and line breaks.
+
+    Args:
+        text (str): The preprocessed input text.
+
+    Returns:
+        list: A list of non-empty sentence strings.
+    """
+    if not text:
+        return []
+    sentences = _SENTENCE_BOUNDARY.split(text)
+    return [s.strip() for s in sentences if s and s.strip()]
+
+
+def iter_sentences(pages):
+    """
+    Yields the sentences of a document page by page.
+
+    Args:
+        pages (iterable): Preprocessed page texts, e.g. from `iter_preprocessed`.
+
+    Yields:
+        str: Each non-empty sentence, in document order.
+    """
+    for page in pages:
+        yield from split_into_sentences(page)
+
 
-    # Replace multiple newlines with a single newline
-    text = re.sub(r'\n+', '\n', text)
+def chunk_text(text, count_tokens, max_tokens=512, overlap_sentences=0):
+    """
+    Splits text into sentence-aligned windows that fit within a token budget.
 
-    # Replace multiple spaces with a single space
-    text = re.sub(r' +', ' ', text)
+    Sentences are packed greedily into a window until adding the next one would
+    exceed `max_tokens`. A single sentence longer than the budget becomes a window
+    of its own and is left to the tokenizer's truncation.
 
-    # Remove leading/trailing whitespace from each line and then join them
-    text = "\n".join([line.strip() for line in text.splitlines()])
+    Args:
+        text (str): The preprocessed input text.
+        count_tokens (callable): Returns the number of tokens in a string.
+        max_tokens (int): Maximum number of tokens per window.
+        overlap_sentences (int): Number of trailing sentences from the previous window
+                                 to repeat at the start of the next one.
 
-    # Strip any leading/trailing whitespace from the entire text
-    return text.strip()
+    Returns:
+        list: A list of chunk strings, in document order.
+    """
+    return list(iter_chunks(split_into_sentences(text), count_tokens, max_tokens, overlap_sentences))
+
+
+def iter_chunks(sentences, count_tokens, max_tokens=512, overlap_sentences=0):
+    """
+    Packs a stream of sentences into windows, as `chunk_text` does, yielding each window when it is full.
+
+    Only the current window is held in memory, so a document of any length can be chunked
+    as its pages are extracted.
+
+    Args:
+        sentences (iterable): Sentences in document order, e.g. from `iter_sentences`.
+        count_tokens (callable): Returns the number of tokens in a string.
+        max_tokens (int): Maximum number of tokens per window.
+        overlap_sentences (int): Number of trailing sentences from the previous window
+                                 to repeat at the start of the next one.
+
+    Yields:
+        str: Each chunk, in document order.
+    """
+    window, window_tokens = [], []
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if window and sum(window_tokens) + tokens > max_tokens:
+            yield " ".join(window)
+
+            # Carry the tail of the previous window over, as long as it still leaves room
+            keep = min(overlap_sentences, len(window) - 1) if overlap_sentences > 0 else 0
+            window, window_tokens = window[len(window) - keep:], window_tokens[len(window_tokens) - keep:]
+            while window and sum(window_tokens) + tokens > max_tokens:
+                window.pop(0)
+                window_tokens.pop(0)
+
+        window.append(sentence)
+        window_tokens.append(tokens)
+
+    if window:
+        yield " ".join(window)